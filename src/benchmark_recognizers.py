@@ -0,0 +1,118 @@
+"""
+Benchmark the recognizer backends on a directory of recorded card images.
+
+    python src/benchmark_recognizers.py tests/ --backend easyocr --backend qr --repeat 3
+
+Each image's expected number comes from a labels.csv in the directory (lines of
+"filename,number") or, failing that, from the leading digits of the filename
+(e.g. "478_rain.jpg" -> 478). Unlabeled images only count towards timing.
+
+The backends are built exactly as car_line_v4 configures them, so the numbers reflect the
+settings a lane would actually run with.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import re
+import time
+
+import cv2
+
+import car_line_v4
+from car_line.metrics import percentiles
+from car_line.preprocess import parse_steps
+from car_line.recognizers import RECOGNIZERS
+from car_line.sources import IMAGE_EXTENSIONS
+
+
+def load_images(directory):
+    """Returns a list of (filename, image, expected number or None)."""
+    labels = {}
+    labels_file = os.path.join(directory, 'labels.csv')
+    if os.path.exists(labels_file):
+        with open(labels_file, newline='') as f:
+            for row in csv.reader(f):
+                if len(row) >= 2:
+                    labels[row[0].strip()] = row[1].strip()
+
+    images = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(directory, filename))
+        if image is None:
+            logging.warning(f"Could not read {filename}, skipping")
+            continue
+        match = re.match(r'(\d+)', filename)
+        expected = labels.get(filename, match.group(1) if match else None)
+        images.append((filename, image, expected))
+    return images
+
+
+def benchmark(recognizer, images, repeat=1):
+    """Runs every image through the recognizer and returns latency and accuracy figures."""
+    recognizer.start()
+    recognizer.recognize(images[0][1])  # warm-up, also waits for a lazily loaded model
+    if recognizer.failed:
+        raise RuntimeError("backend could not be initialized")
+
+    latencies = []
+    correct = wrong = labeled = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for filename, image, expected in images:
+            t = time.perf_counter()
+            numbers = recognizer.recognize(image)
+            latencies.append(time.perf_counter() - t)
+            if expected is not None:
+                labeled += 1
+                correct += expected in numbers
+                wrong += any(number != expected for number in numbers)
+    elapsed = time.perf_counter() - start
+
+    latency = percentiles(latencies)
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': latency[50],
+        'p95': latency[95],
+        'p99': latency[99],
+        'accuracy': correct / labeled if labeled else None,
+        'wrong': wrong,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recognizer backends on recorded card images.")
+    parser.add_argument('directory', help="directory of card images")
+    parser.add_argument('--backend', action='append', choices=sorted(RECOGNIZERS),
+                        help="backend to test (repeatable, default: all)")
+    parser.add_argument('--repeat', type=int, default=1, help="passes over the image set")
+    parser.add_argument('--preprocess', help="preprocessing preset or comma-separated steps, "
+                                             "e.g. 'threshold' or 'clahe,dilate' (default: as configured in v4)")
+    args = parser.parse_args()
+
+    images = load_images(args.directory)
+    if not images:
+        print(f"No images found in {args.directory}")
+        return
+
+    print(f"{len(images)} images, {sum(e is not None for _, _, e in images)} labeled\n")
+    print(f"{'backend':<10} {'frames':>6} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'accuracy':>8} {'wrong':>5}")
+    for name in args.backend or sorted(RECOGNIZERS):
+        try:
+            recognizer = car_line_v4.build_recognizer(name, preprocess=parse_steps(args.preprocess))
+            result = benchmark(recognizer, images, args.repeat)
+        except Exception as e:
+            print(f"{name:<10} failed: {e}")
+            continue
+        accuracy = f"{result['accuracy']:.0%}" if result['accuracy'] is not None else "-"
+        print(f"{name:<10} {result['frames']:>6} {result['fps']:>7.1f} {result['p50'] * 1000:>8.1f} "
+              f"{result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {accuracy:>8} {result['wrong']:>5}")
+
+
+if __name__ == "__main__":
+    main()
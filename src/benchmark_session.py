@@ -0,0 +1,215 @@
+"""
+Replay a recorded session through the car_line_v4 pipeline and score it.
+
+    python src/car_line_v4.py --record sessions/tuesday        # record a lane
+    python src/benchmark_session.py sessions/tuesday --labels sessions/tuesday/labels.csv
+
+The session (or a video file / image directory, see car_line.sources) is run frame by frame
+through the same motion detector, scheduler, card tracker, quality gate, QR fast path, recognizer and debouncer
+that car_line_v4 configures, on the session's own clock. Frames are processed in order, one at a time
+and as fast as possible, so two runs over the same session give the same posts and the numbers
+can be compared before and after a change.
+
+The label file lists when each card was in view, in seconds from the start of the session:
+
+    number,start,end
+    478,12.4,19.0
+
+A post counts as correct when its number was in view at that time (give or take --slack
+seconds). Precision is correct posts / all posts, recall is labeled cards that got posted /
+all labeled cards, and latency runs from the card appearing to its post, including the time
+OCR took.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import time
+
+import car_line_v4
+from car_line.config import ConfigError
+from car_line.metrics import percentiles
+from car_line.preprocess import parse_steps
+from car_line.recognizers import RECOGNIZERS
+from car_line.sources import open_source
+
+
+def load_labels(path):
+    """Reads number,start,end rows. Returns a list of (number, start, end)."""
+    with open(path, newline='') as f:
+        return [(row['number'].strip(), float(row['start']), float(row['end'])) for row in csv.DictReader(f)]
+
+
+def replay(source, recognizer, fast_decode=None, track=None):
+    """
+    Runs every frame through the v4 stages. Returns (posts as (post_time, number), counters).
+    track turns the card tracker on or off (None: as configured in v4).
+    """
+    track = car_line_v4.TRACK_CARDS if track is None else track
+    motion_detector = car_line_v4.build_motion_detector()
+    scheduler = car_line_v4.build_scheduler()
+    debouncer = car_line_v4.build_debouncer()
+    tracker = car_line_v4.build_tracker(motion_detector.regions) if track else None
+    quality_gate = car_line_v4.build_quality_gate(motion_detector) if car_line_v4.QUALITY_GATE else None
+    counters = {'frames': 0, 'motion_checks': 0, 'motion_frames': 0, 'qr_reads': 0, 'ocr_calls': 0, 'tracks': 0,
+                'rejected': 0}
+    ocr_times = []
+    posts = []
+
+    def usable(frame):
+        if quality_gate is None or quality_gate.usable(frame):
+            return True
+        counters['rejected'] += 1
+        return False
+
+    def read(timestamp, frame, track_id=None):
+        t = time.perf_counter()
+        numbers = fast_decode(frame) if fast_decode is not None else []
+        trusted = bool(numbers)
+        if trusted:
+            counters['qr_reads'] += 1
+        else:
+            numbers = recognizer.recognize(frame)
+            counters['ocr_calls'] += 1
+        elapsed = time.perf_counter() - t
+        ocr_times.append(elapsed)
+
+        if numbers:
+            scheduler.mark_active(timestamp)
+        # The post goes out once recognition has finished, so its time includes the OCR pass
+        for number in debouncer.update(numbers, timestamp, confirm_frames=1 if trusted else None):
+            posts.append((timestamp + elapsed, number))
+        if track_id is not None:
+            posted = all(debouncer.recently_posted(number, timestamp) for number in numbers)
+            tracker.record_result(track_id, numbers, done=bool(numbers) and posted)
+
+    recognizer.start()
+    start = time.perf_counter()
+    first = True
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        timestamp = source.timestamp
+        counters['frames'] += 1
+        if first:
+            motion_detector.update(frame)  # seed the background model, as CarLinePipeline.run does
+            first = False
+            continue
+        if not scheduler.due(timestamp):
+            continue
+
+        counters['motion_checks'] += 1
+        motion = motion_detector.update(frame)
+        scheduler.record_check(timestamp, motion)
+        if motion:
+            counters['motion_frames'] += 1
+        if tracker is not None:
+            for track_id, best_timestamp, best_frame in tracker.update(timestamp, frame, motion,
+                                                                       motion and usable(frame)):
+                read(best_timestamp, best_frame, track_id)
+        elif motion and usable(frame):
+            read(timestamp, frame)
+
+    if tracker is not None and counters['frames']:
+        # End the tracks still open when the session stops, so their best frames get read too
+        for _ in range(tracker.max_missed + 1):
+            for track_id, best_timestamp, best_frame in tracker.update(timestamp, None, False):
+                read(best_timestamp, best_frame, track_id)
+        counters['tracks'] = tracker.started
+
+    counters['wall_time'] = time.perf_counter() - start
+    ocr_latency = percentiles(ocr_times)
+    counters['ocr_p50'] = ocr_latency[50]
+    counters['ocr_p95'] = ocr_latency[95]
+    recognizer.close()
+    return posts, counters
+
+
+def score(posts, labels, slack=1.0):
+    """Matches posts against labeled intervals. Returns precision, recall and card-to-post latencies."""
+    correct = 0
+    posted_labels = {}  # label index -> first matching post time
+    for post_time, number in posts:
+        matches = [i for i, (label_number, start, end) in enumerate(labels)
+                   if label_number == number and start - slack <= post_time <= end + slack]
+        if matches:
+            correct += 1
+            for i in matches:
+                posted_labels.setdefault(i, post_time)
+    latencies = [max(0.0, post_time - labels[i][1]) for i, post_time in posted_labels.items()]
+    return {
+        'precision': correct / len(posts) if posts else None,
+        'recall': len(posted_labels) / len(labels) if labels else None,
+        'latencies': latencies,
+        'missed': [labels[i][0] for i in range(len(labels)) if i not in posted_labels],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the v4 pipeline on a recorded session.")
+    parser.add_argument('session', help="session directory, video file or image directory")
+    parser.add_argument('--labels', help="number,start,end CSV (default: labels.csv in the session directory)")
+    parser.add_argument('--config', help="lane config file to run with (see car_line_v4 --config)")
+    parser.add_argument('--backend', choices=sorted(RECOGNIZERS), help="default: as configured in v4")
+    parser.add_argument('--slack', type=float, default=1.0, help="seconds a post may fall outside its label")
+    parser.add_argument('--track', action=argparse.BooleanOptionalAction,
+                        help="OCR only the sharpest frames of each card track (default: as configured in v4)")
+    parser.add_argument('--preprocess', help="preprocessing preset or comma-separated steps, "
+                                             "e.g. 'threshold' or 'clahe,dilate' (default: as configured in v4)")
+    args = parser.parse_args()
+    if args.config:
+        try:
+            car_line_v4.load_settings(args.config)
+        except ConfigError as e:
+            print(f"Invalid config: {e}")
+            return
+    backend = args.backend or car_line_v4.RECOGNIZER_BACKEND
+    track = car_line_v4.TRACK_CARDS if args.track is None else args.track
+
+    labels_file = args.labels
+    if labels_file is None and os.path.isdir(args.session):
+        labels_file = os.path.join(args.session, 'labels.csv')
+    labels = load_labels(labels_file) if labels_file and os.path.exists(labels_file) else []
+
+    source = open_source(args.session, realtime=False)
+    if not source.isOpened():
+        print(f"Could not open {args.session}")
+        return
+    fast_decode = car_line_v4.qr_decoder.decode if car_line_v4.READ_QR_CODES and backend != 'qr' else None
+    recognizer = car_line_v4.build_recognizer(backend, preprocess=parse_steps(args.preprocess))
+    posts, counters = replay(source, recognizer, fast_decode, track)
+    source.release()
+    if recognizer.failed:
+        print(f"Warning: the {backend} backend failed to initialize, its OCR calls found nothing\n")
+
+    wall_time = counters['wall_time']
+    print(f"frames          {counters['frames']} ({counters['frames'] / wall_time if wall_time else 0.0:.1f} fps)")
+    print(f"motion checks   {counters['motion_checks']}, with motion {counters['motion_frames']}, "
+          f"rejected by the quality gate {counters['rejected']}")
+    if track:
+        print(f"card tracks     {counters['tracks']}")
+    print(f"OCR calls       {counters['ocr_calls']} (p50 {counters['ocr_p50'] * 1000:.1f}ms, "
+          f"p95 {counters['ocr_p95'] * 1000:.1f}ms), QR reads {counters['qr_reads']}")
+    print(f"posts           {len(posts)}: {', '.join(number for _, number in posts)}")
+    if not labels:
+        print("no labels, skipping precision / recall")
+        return
+
+    result = score(posts, labels, args.slack)
+    latencies = result['latencies']
+    precision = f"{result['precision']:.0%}" if result['precision'] is not None else "-"
+    print(f"precision       {precision}")
+    print(f"recall          {result['recall']:.0%} ({len(latencies)} of {len(labels)} cards)")
+    if latencies:
+        latency = percentiles(latencies)
+        print(f"card to post    p50 {latency[50]:.2f}s, p95 {latency[95]:.2f}s, "
+              f"max {max(latencies):.2f}s")
+    if result['missed']:
+        print(f"missed          {', '.join(result['missed'])}")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # keep the per-frame log lines out of the report
+    main()
@@ -0,0 +1 @@
+"""Shared building blocks for the car_line scripts (capture, recognition and posting stages)."""
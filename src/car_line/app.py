@@ -0,0 +1,234 @@
+"""
+The shared car_line main loop.
+
+Opens the cameras, wires a recognizer backend into the threaded pipeline together with the motion
+detector, scheduler, debouncer and API dispatcher, and shows the preview windows. The car_line
+scripts only differ in how they configure these pieces.
+
+In headless mode there are no windows at all (no cv2.imshow / waitKey, no X server needed): the
+main thread just waits for SIGINT / SIGTERM, and the feeds can optionally be watched through the
+low-rate MJPEG debug stream instead.
+
+One process can drive several lanes: every camera gets its own capture thread, motion check,
+scheduler and debouncer, and they all feed one shared pool of OCR workers, so the OCR model is
+only loaded once. Numbers are posted tagged with the lane that read them.
+"""
+
+import functools
+import logging
+import os
+import signal
+import threading
+
+import cv2
+
+from car_line.debug_stream import DebugStreamServer
+from car_line.metrics import MetricsLogger, MetricsServer
+from car_line.motion import MotionDetector
+from car_line.pipeline import CarLinePipeline, OcrPool
+from car_line.scheduler import FrameScheduler
+from car_line.sources import open_source
+
+
+def run_car_line(recognizer, dispatcher, motion_detector=None, scheduler=None, debouncer=None, fast_decode=None,
+                 batch_size=1, batch_max_wait=0.25, camera=0, preview=None, headless=False, debug_stream_port=None):
+    """
+    Runs the car line until 'q' is pressed (or a stop signal arrives) or the camera stops delivering frames.
+
+    preview is the LatestFrame the recognizer writes its OCR input into, shown next to the camera feed.
+    """
+    motion_detector = motion_detector or MotionDetector()
+    run_lanes([{'id': None, 'camera': camera}], recognizer, dispatcher,
+              make_motion_detector=lambda: motion_detector,
+              make_scheduler=lambda: scheduler,
+              make_debouncer=lambda: debouncer,
+              fast_decode=fast_decode, batch_size=batch_size, batch_max_wait=batch_max_wait, preview=preview,
+              headless=headless, debug_stream_port=debug_stream_port)
+
+
+def open_camera(camera, record_dir=None, camera_settings=None):
+    """
+    Opens a camera (device index, RTSP URL, video file or recorded session, see car_line.sources)
+    and reads its first frame. Returns (cap, frame). With record_dir, every frame is also recorded there.
+    camera_settings are car_line.capture.Camera options for a live camera (format, size, fps, ...).
+    """
+    cap = open_source(camera, record_dir=record_dir, camera_settings=camera_settings)
+    if not camera_settings:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Don't let stale frames queue up in the driver
+
+    if not cap.isOpened():
+        logging.error(f"Error: Could not open camera {camera}")
+        cap.release()
+        return None, None
+
+    # Read the first frame
+    ret, frame = cap.read()
+    if not ret:
+        logging.error(f"Error: Could not read initial frame from camera {camera}")
+        cap.release()
+        return None, None
+
+    height, width = frame.shape[:2]
+    print(f"Initial Camera Image Size ({camera}): Width = {width}, Height = {height}")
+    return cap, frame
+
+
+def run_lanes(lanes, recognizer, dispatcher, make_motion_detector=MotionDetector, make_scheduler=FrameScheduler,
+              make_debouncer=None, make_tracker=None, make_quality_gate=None, fast_decode=None, ocr_workers=1,
+              batch_size=1, batch_max_wait=0.25, preview=None, headless=False, debug_stream_port=None,
+              debug_stream_fps=2.0, record_dir=None, metrics_port=None, metrics_log_interval=None,
+              camera_settings=None):
+    """
+    Runs one lane per camera until 'q' is pressed, SIGINT / SIGTERM arrives or every camera stops
+    delivering frames.
+
+    lanes is a list of {'id': ..., 'camera': ...} dicts, camera being a device index, RTSP URL or video
+    file. The make_* arguments are called once per lane, since motion, scheduling and debouncing
+    state belongs to one camera. A camera that can't be opened is skipped; the other lanes still run.
+    make_tracker(regions, lane_id), if given, builds a CardTracker on the lane's motion regions so
+    only the sharpest frame of each card goes to OCR. make_quality_gate(motion_detector, lane_id), if
+    given, builds a QualityGate that keeps blurred, dark or glaring frames away from OCR.
+
+    headless skips the preview windows. debug_stream_port serves the feeds as MJPEG at
+    debug_stream_fps instead (works with or without headless). record_dir records every lane to a
+    session directory (one sub-directory per lane id) for replaying later.
+
+    camera_settings are car_line.capture.Camera options (api, fourcc, width, height, fps, buffer_size,
+    gray, buffers) for every live camera; a lane's own 'capture' dict overrides them for that lane.
+
+    metrics_port serves per-stage timings and counters at /metrics (Prometheus text format);
+    metrics_log_interval logs them as one JSON line every so many seconds.
+    """
+    ocr_pool = OcrPool(recognizer.recognize, recognizer.recognize_batch, workers=ocr_workers,
+                       queue_size=2 * max(len(lanes), 1), batch_size=batch_size, batch_max_wait=batch_max_wait)
+    opened = []  # (lane, cap, pipeline, motion_detector)
+    threads = []
+    stop_event = threading.Event()
+    previous_handlers = install_stop_signals(stop_event)
+    debug_stream = None
+    metrics_reporters = []
+    try:
+        recognizer.start()
+        dispatcher.start()
+
+        for lane in lanes:
+            lane_id = lane['id']
+            lane_record_dir = None
+            if record_dir is not None:
+                lane_record_dir = record_dir if lane_id is None else os.path.join(record_dir, f"lane-{lane_id}")
+            settings = dict(camera_settings or {}, **lane.get('capture', {}))
+            cap, first_frame = open_camera(lane['camera'], lane_record_dir, settings or None)
+            if cap is None:
+                continue
+            motion_detector = make_motion_detector()
+            tracker = make_tracker(motion_detector.regions, lane_id) if make_tracker is not None else None
+            quality_gate = make_quality_gate(motion_detector, lane_id) if make_quality_gate is not None else None
+            post = dispatcher.submit if lane_id is None else functools.partial(dispatcher.submit, lane=lane_id)
+            # Capture and posting run on the lane's own threads; OCR runs on the shared pool, so a
+            # slow OCR pass or a hung endpoint never stalls a camera.
+            pipeline = CarLinePipeline(cap, motion_detector.update, recognizer.recognize, post,
+                                       scheduler=make_scheduler(),
+                                       debouncer=make_debouncer() if make_debouncer is not None else None,
+                                       fast_decode=fast_decode, ocr_pool=ocr_pool, lane_id=lane_id,
+                                       tracker=tracker, quality_gate=quality_gate)
+            opened.append((lane, cap, pipeline, motion_detector))
+            pipeline.start()
+            thread = threading.Thread(target=pipeline.run, args=(first_frame,), daemon=True,
+                                      name="motion" if lane_id is None else f"motion-{lane_id}")
+            thread.start()
+            threads.append(thread)
+
+        if not opened:
+            return
+        ocr_pool.start()
+
+        if metrics_port is not None:
+            metrics_reporters.append(MetricsServer(port=metrics_port).start())
+        if metrics_log_interval:
+            metrics_reporters.append(MetricsLogger(interval=metrics_log_interval).start())
+        if debug_stream_port is not None:
+            sources = {("lane" if lane['id'] is None else f"lane-{lane['id']}"): pipeline.latest
+                       for lane, _, pipeline, _ in opened}
+            if preview is not None:
+                sources['ocr-input'] = preview
+            debug_stream = DebugStreamServer(sources, debug_stream_port, debug_stream_fps).start()
+
+        if headless:
+            wait_for_stop(opened, recognizer, stop_event)
+        else:
+            show_lanes(opened, recognizer, preview, stop_event)
+
+    except Exception as e:
+        logging.error(f"Error in main function: {e}")
+
+    finally:
+        # Stop the workers, release the cameras and destroy all windows
+        if debug_stream is not None:
+            debug_stream.stop()
+        for lane, cap, pipeline, motion_detector in opened:
+            pipeline.stop()
+            label = "" if lane['id'] is None else f" (lane {lane['id']})"
+            logging.info(f"Motion checks{label}: {motion_detector.checks}, "
+                         f"average cost {motion_detector.avg_cost * 1000:.2f}ms per check")
+        for thread in threads:
+            thread.join(2.0)
+        ocr_pool.stop()
+        recognizer.close()
+        logging.info(f"Dispatcher stats: {dispatcher.stats()}")
+        dispatcher.stop()
+        for reporter in metrics_reporters:
+            reporter.stop()
+        for _, cap, _, _ in opened:
+            cap.release()
+        if not headless:
+            cv2.destroyAllWindows()
+        restore_signals(previous_handlers)
+
+
+def install_stop_signals(stop_event):
+    """Makes SIGINT / SIGTERM set stop_event for a clean shutdown. Returns the previous handlers."""
+    if threading.current_thread() is not threading.main_thread():
+        return {}  # signal handlers can only be installed from the main thread
+    previous = {}
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous[signum] = signal.signal(signum, lambda signum, frame: stop_event.set())
+    return previous
+
+
+def restore_signals(previous_handlers):
+    for signum, handler in previous_handlers.items():
+        signal.signal(signum, handler)
+
+
+def lanes_running(opened, recognizer, stop_event):
+    """False once we were asked to stop, the backend failed or every lane has stopped."""
+    if stop_event.is_set() or recognizer.failed:  # Nothing can be recognized without a working backend
+        return False
+    return any(not pipeline.stop_event.is_set() for _, _, pipeline, _ in opened)
+
+
+def wait_for_stop(opened, recognizer, stop_event):
+    """Headless main loop: nothing to draw, just wait for a stop signal or for the lanes to end."""
+    logging.info("Running headless, send SIGINT or SIGTERM to stop")
+    while lanes_running(opened, recognizer, stop_event):
+        stop_event.wait(0.5)
+
+
+def show_lanes(opened, recognizer, preview=None, stop_event=None):
+    """Shows every lane's newest frame (and the last OCR input) until 'q' is pressed or all lanes stop."""
+    stop_event = stop_event or threading.Event()
+    last_seqs = [0] * len(opened)
+    while lanes_running(opened, recognizer, stop_event):
+        for i, (lane, _, pipeline, _) in enumerate(opened):
+            item = pipeline.latest.get(last_seqs[i], timeout=0)
+            if item is not None:
+                last_seqs[i], _, frame = item
+                cv2.imshow("Original Frame" if lane['id'] is None else f"Lane {lane['id']}", frame)
+        if preview is not None:
+            ocr_input = preview.peek()
+            if ocr_input is not None:
+                cv2.imshow("OCR Input", ocr_input)
+
+        # Break the loop if 'q' is pressed
+        if cv2.waitKey(10) & 0xFF == ord('q'):
+            return
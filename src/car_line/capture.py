@@ -0,0 +1,149 @@
+"""
+Configured camera capture.
+
+cv2.VideoCapture(0) with default settings runs on whatever backend, pixel format and resolution
+OpenCV and the driver agree on, converts every frame to a freshly allocated BGR array, and
+queues several frames in the driver. On low-power lane hardware that is a lot of memory traffic
+for frames nobody looks at. Camera asks for everything up front instead:
+
+    api          capture backend: 'v4l2' (Linux), 'dshow' / 'msmf' (Windows), or None for OpenCV's pick
+    fourcc       pixel format from the camera: 'MJPG' (compressed, needed for high resolutions / fps on
+                 USB 2) or 'YUYV' (uncompressed, no decoding)
+    width, height, fps
+    buffer_size  frames queued in the driver (1 keeps the lane current)
+    gray         deliver only the luminance plane: with V4L2 the raw YUYV / MJPEG data is read as is
+                 (CAP_PROP_CONVERT_RGB off) and only Y is extracted or decoded, so no BGR conversion
+                 happens at all. Every stage downstream accepts single-channel frames.
+    buffers      opt in to reading frames into this many (at least MIN_BUFFERS) preallocated arrays
+                 in turn instead of a new array per frame; None (the default) allocates every frame
+
+With buffers, a frame from read() is only valid until the ring comes back around to its array.
+Stages that keep a frame longer (frames queued for OCR, the card tracker's best frames) copy it,
+and the pipeline's LatestFrame tells them whether the capture thread got to the array first, in
+which case the frame is dropped.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+APIS = {
+    None: cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'gstreamer': cv2.CAP_GSTREAMER,
+}
+
+MIN_BUFFERS = 3  # the frame being read, the newest frame and one frame of slack for a slow consumer
+
+
+def fourcc_name(value):
+    """CAP_PROP_FOURCC's float back to its four characters ('' if the backend doesn't say)."""
+    value = int(value)
+    return "".join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip('\0') if value else ""
+
+
+class Camera:
+    """A cv2.VideoCapture look-alike with the format requested up front and optional rotating frame buffers."""
+
+    def __init__(self, device=0, api=None, fourcc=None, width=None, height=None, fps=None, buffer_size=1,
+                 gray=False, buffers=None):
+        if api not in APIS:
+            raise ValueError(f"Unknown capture api '{api}', choose from {sorted(name for name in APIS if name)}")
+        if buffers is not None and buffers < MIN_BUFFERS:
+            raise ValueError(f"A camera needs at least {MIN_BUFFERS} frame buffers, or None for none")
+        self.device = device
+        self.gray = gray
+        self.buffers = buffers  # frames read before a frame's array is reused, None if it never is
+        self.cap = cv2.VideoCapture(device, APIS[api])
+        self._buffers = [None] * (buffers or 1)
+        self._next = 0
+        self._raw = None
+        self._raw_gray = False  # True once the backend is known to hand over raw YUYV / MJPEG data
+        self._y_channel = 0
+        self._height = 0
+        if not self.cap.isOpened():
+            return
+
+        # The format has to be chosen before the size: many drivers only offer some sizes in MJPEG
+        if fourcc is not None:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size is not None:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        if gray:
+            self._raw_gray = bool(self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+            self._y_channel = 1 if fourcc_name(self.cap.get(cv2.CAP_PROP_FOURCC)) == 'UYVY' else 0
+            self._height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # Drivers silently round to what they support, so log what we actually got
+        logging.info(f"Camera {device}: {fourcc_name(self.cap.get(cv2.CAP_PROP_FOURCC)) or 'default format'} "
+                     f"{int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} "
+                     f"@ {self.cap.get(cv2.CAP_PROP_FPS):g} fps{', luminance only' if gray else ''}")
+
+    def read(self):
+        i = self._next
+        self._next = (i + 1) % len(self._buffers)
+        if not self.gray:
+            if self.buffers is None:
+                return self.cap.read()
+            # VideoCapture.read() fills the array it is given when the size matches
+            ret, frame = self.cap.read(self._buffers[i])
+            if ret:
+                self._buffers[i] = frame
+            return ret, frame
+
+        ret, self._raw = self.cap.read(self._raw)
+        if not ret:
+            return False, None
+        frame = self._luminance(self._raw, self._buffers[i] if self.buffers is not None else None)
+        if self.buffers is not None:
+            self._buffers[i] = frame
+        return frame is not None, frame
+
+    def _luminance(self, raw, out):
+        if raw.ndim == 3 and raw.shape[2] == 2:
+            # Packed YUYV (or UYVY): Y is every other byte
+            out = _buffer(out, raw.shape[:2])
+            return cv2.extractChannel(raw, self._y_channel, dst=out)
+        if raw.ndim == 3 and raw.shape[2] == 3:
+            # The backend converted to BGR anyway
+            out = _buffer(out, raw.shape[:2])
+            return cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY, dst=out)
+        if self._raw_gray and (raw.ndim == 1 or raw.shape[0] == 1):
+            # Compressed MJPEG: the JPEG decoder skips the chroma planes for a grayscale decode
+            frame = cv2.imdecode(raw.reshape(-1), cv2.IMREAD_GRAYSCALE)
+            if frame is None:
+                logging.error(f"Camera {self.device}: could not decode an MJPEG frame")
+            return frame
+        # Grayscale already, or planar YUV with the Y plane in the first rows. raw is reused by the next
+        # read, so it is copied out.
+        plane = raw[:self._height] if self._raw_gray and 0 < self._height < raw.shape[0] else raw
+        out = _buffer(out, plane.shape)
+        np.copyto(out, plane)
+        return out
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+def _buffer(buffer, shape):
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, np.uint8)
+    return buffer
@@ -0,0 +1,210 @@
+"""
+Lane configuration files.
+
+The car_line settings are module constants, so tuning a lane used to mean editing the script and
+restarting it, which also reloads the OCR model. A config file (JSON, or TOML on Python 3.11+)
+overrides any of them by name, in either case:
+
+    # lane-north.toml
+    lanes = [{id = "north", camera = 0}]
+    motion_threshold = 25
+    roi_x_start = 40
+
+Every value is checked against the script's schema, a Setting per name giving its type, range or
+choices, before anything is applied, and all the problems are reported at once.
+
+Settings marked hot (thresholds, ROI, sample rates, ...) are reloaded while the lane runs:
+ConfigWatcher checks the file's modification time every couple of seconds and hands the hot
+values that changed to the script, which pushes them into the running stages without touching
+the loaded recognizer. Structural settings (cameras, backend, model, worker counts, ports) only
+take effect on restart; changing one is logged. A file that fails to parse or validate is ignored,
+and the lane keeps running on the values it has.
+"""
+
+import json
+import logging
+import os
+import threading
+
+from car_line.capture import MIN_BUFFERS
+
+CAPTURE_OPTIONS = ('api', 'fourcc', 'width', 'height', 'fps', 'buffer_size', 'gray', 'buffers')
+
+
+class ConfigError(ValueError):
+    """A config file that can't be read or has invalid values."""
+
+
+class Setting:
+    """Type, range and reload behavior of one setting."""
+
+    def __init__(self, kind, hot=False, optional=False, minimum=None, maximum=None, choices=None, validate=None):
+        self.kinds = kind if isinstance(kind, tuple) else (kind,)
+        self.hot = hot  # can change while the lane runs
+        self.optional = optional  # None is allowed
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.validate = validate  # validate(value) -> error message or None, for anything more involved
+
+    def convert(self, value):
+        """Returns (value, error). Lists become tuples where a tuple is expected (JSON and TOML have no tuples)."""
+        if value is None:
+            return None, None if self.optional else "may not be empty"
+        if isinstance(value, list) and tuple in self.kinds:
+            value = tuple(value)
+        if isinstance(value, int) and not isinstance(value, bool) and float in self.kinds and int not in self.kinds:
+            value = float(value)
+        # bool is an int subclass, but true is not a threshold
+        matches = bool in self.kinds if isinstance(value, bool) else isinstance(value, self.kinds)
+        if not matches:
+            return value, f"must be {self._kind_names()}"
+        if self.choices is not None and value not in self.choices:
+            return value, f"must be one of {', '.join(repr(choice) for choice in self.choices)}"
+        if self.minimum is not None and isinstance(value, (int, float)) and value < self.minimum:
+            return value, f"must be at least {self.minimum}"
+        if self.maximum is not None and isinstance(value, (int, float)) and value > self.maximum:
+            return value, f"must be at most {self.maximum}"
+        if self.validate is not None:
+            error = self.validate(value)
+            if error:
+                return value, error
+        return value, None
+
+    def _kind_names(self):
+        names = {bool: "true or false", int: "a whole number", float: "a number", str: "text", list: "a list",
+                 tuple: "a list", dict: "a table"}
+        return " or ".join(dict.fromkeys(names.get(kind, kind.__name__) for kind in self.kinds))
+
+
+def check_lanes(lanes):
+    """Validates a LANES list: {'id': ..., 'camera': ..., 'capture': {...}} entries with unique ids."""
+    if not lanes:
+        return "needs at least one lane"
+    ids = []
+    for i, lane in enumerate(lanes):
+        if not isinstance(lane, dict) or 'camera' not in lane:
+            return f"lane {i + 1} needs a camera"
+        if not isinstance(lane['camera'], (int, str)) or isinstance(lane['camera'], bool):
+            return f"lane {i + 1}: camera must be a device number, URL or file"
+        unknown = set(lane) - {'id', 'camera', 'capture'}
+        if unknown:
+            return f"lane {i + 1}: unknown keys {', '.join(sorted(unknown))}"
+        unknown = set(lane.get('capture', {})) - set(CAPTURE_OPTIONS)
+        if unknown:
+            return f"lane {i + 1}: unknown capture options {', '.join(sorted(unknown))}"
+        buffers = lane.get('capture', {}).get('buffers')
+        if buffers is not None and (not isinstance(buffers, int) or isinstance(buffers, bool) or buffers < MIN_BUFFERS):
+            return f"lane {i + 1}: capture buffers must be at least {MIN_BUFFERS}"
+        ids.append(lane.get('id'))
+    if len(lanes) > 1 and (None in ids or len(set(ids)) != len(ids)):
+        return "every lane needs its own id when there is more than one"
+    return None
+
+
+def read_file(path):
+    """Reads a .json or .toml file into a dict."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.json', '.toml'):
+        raise ConfigError(f"{path}: config files must be .json or .toml")
+    if extension == '.toml':
+        try:
+            import tomllib  # Python 3.11+
+        except ImportError:
+            raise ConfigError("TOML config files need Python 3.11 or newer, use JSON instead")
+    try:
+        if extension == '.json':
+            with open(path) as f:
+                values = json.load(f)
+        else:
+            with open(path, 'rb') as f:
+                values = tomllib.load(f)
+    except (ValueError, OSError) as e:  # JSON and TOML syntax errors are ValueErrors
+        raise ConfigError(f"{path}: {e}")
+    if not isinstance(values, dict):
+        raise ConfigError(f"{path}: expected a table of settings at the top level")
+    return values
+
+
+def load_config(path, schema):
+    """Reads and validates a config file. Returns {SETTING_NAME: value} for the settings it sets."""
+    values = {}
+    errors = []
+    for key, value in read_file(path).items():
+        name = key.upper()
+        setting = schema.get(name)
+        if setting is None:
+            errors.append(f"{key}: unknown setting")
+            continue
+        value, error = setting.convert(value)
+        if error:
+            errors.append(f"{key}: {error}")
+        else:
+            values[name] = value
+    if errors:
+        raise ConfigError(f"{path}: " + "; ".join(errors))
+    return values
+
+
+class ConfigWatcher:
+    """Reloads a config file when it changes and hands the hot settings that changed to apply()."""
+
+    def __init__(self, path, schema, values, apply, reload_interval=2.0):
+        self.path = path
+        self.schema = schema
+        self.values = dict(values)  # the values in effect, by name
+        self.apply = apply  # apply({name: value}) pushes new values into the running lane
+        self.reload_interval = reload_interval
+        self._mtime = self._current_mtime()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _current_mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def reload(self):
+        """Applies the file's hot settings if the file changed since the last look. Returns True if any did."""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            values = load_config(self.path, self.schema)
+        except ConfigError as e:
+            logging.error(f"Not reloading the config: {e}")
+            return False
+
+        changed = {name: value for name, value in values.items() if self.values.get(name) != value}
+        hot = {name: value for name, value in changed.items() if self.schema[name].hot}
+        restart = sorted(set(changed) - set(hot))
+        if restart:
+            logging.warning(f"{', '.join(name.lower() for name in restart)} changed in {self.path}; "
+                            f"restart the lane to apply")
+        if not hot:
+            return False
+        try:
+            self.apply(hot)
+        except Exception as e:
+            logging.error(f"Error applying the reloaded config: {e}")
+            return False
+        self.values.update(hot)
+        changes = ", ".join(f"{name.lower()} = {value!r}" for name, value in hot.items())
+        logging.info(f"Reloaded {self.path}: {changes}")
+        return True
+
+    def start_watching(self):
+        """Checks the file for changes every reload_interval seconds."""
+        self._thread = threading.Thread(target=self._watch, name="config-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _watch(self):
+        while not self._stop_event.wait(self.reload_interval):
+            self.reload()
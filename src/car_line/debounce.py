@@ -0,0 +1,78 @@
+"""
+Recognition state between OCR and posting.
+
+A card held up in front of the camera is read again on every OCR pass, and a single bad
+frame can produce a misread (e.g. "81"). NumberDebouncer only lets a number through once it
+has been read in confirm_frames OCR passes within vote_window seconds, and then suppresses it
+for repost_ttl seconds so the same car isn't posted over and over. Reads the decoder marked as
+trusted (car_line.decoding.Read) need no second vote.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class NumberDebouncer:
+    """Confirm-after-N-frames voting plus a TTL cache of recently posted numbers."""
+
+    def __init__(self, confirm_frames=2, vote_window=3.0, repost_ttl=300.0):
+        self.confirm_frames = confirm_frames
+        self.vote_window = vote_window
+        self.repost_ttl = repost_ttl
+
+        self._lock = threading.Lock()
+        self._votes = OrderedDict()  # number -> (count, last_seen), oldest sighting first
+        self._recent = OrderedDict()  # number -> expiry time, soonest expiry first
+        self.suppressed = 0  # reads dropped because the number was already posted
+
+    def update(self, numbers, now=None, confirm_frames=None):
+        """
+        Records one OCR pass and returns the numbers that should be posted now.
+
+        confirm_frames overrides the vote count for this pass, e.g. 1 for QR reads, which are
+        checksummed and don't need a second frame to agree.
+        """
+        now = time.monotonic() if now is None else now
+        confirm_frames = self.confirm_frames if confirm_frames is None else confirm_frames
+        confirmed = []
+        with self._lock:
+            self._evict(now)
+            for number in dict.fromkeys(numbers):  # a number counts once per pass
+                if self._recent.get(number, 0) > now:
+                    # Still in view: keep it suppressed for as long as the car is there
+                    self._recent[number] = now + self.repost_ttl
+                    self._recent.move_to_end(number)
+                    self.suppressed += 1
+                    continue
+
+                count = self._votes.pop(number, (0, now))[0] + 1
+                if count >= confirm_frames or getattr(number, 'trusted', False):
+                    self._recent[number] = now + self.repost_ttl
+                    self._recent.move_to_end(number)
+                    confirmed.append(number)
+                else:
+                    self._votes[number] = (count, now)
+        return confirmed
+
+    def recently_posted(self, number, now=None):
+        """True if number was confirmed within repost_ttl, i.e. further reads of it won't be posted."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expiry = self._recent.get(number)
+            return expiry is not None and expiry > now
+
+    def _evict(self, now):
+        # Both dicts are kept in time order, so expired entries are always at the front. A repost_ttl
+        # lowered on a config reload can leave an expired entry behind a newer one for a while, which is
+        # why update() checks the expiry rather than just membership.
+        while self._votes:
+            number, (_, last_seen) = next(iter(self._votes.items()))
+            if now - last_seen <= self.vote_window:
+                break
+            self._votes.popitem(last=False)
+        while self._recent:
+            number, expiry = next(iter(self._recent.items()))
+            if expiry > now:
+                break
+            self._recent.popitem(last=False)
@@ -0,0 +1,97 @@
+"""
+Low-rate MJPEG debug stream for headless lane boxes.
+
+Lane boxes have no monitor, so instead of cv2.imshow windows the camera feeds (and the last OCR
+input) can be watched from a browser:
+
+    http://<lane box>:8090/             every stream on one page
+    http://<lane box>:8090/stream/lane  one multipart/x-mixed-replace MJPEG stream
+
+Frames are only JPEG-encoded on the stream's own thread, at a few frames per second, and only
+while someone is watching, so the camera loop doesn't pay for the preview.
+"""
+
+import html
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+class DebugStreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        sources = self.server.sources
+        if self.path == '/':
+            items = "".join(f'<h3>{html.escape(name)}</h3><img src="/stream/{quote(name)}">' for name in sources)
+            self.send_body(200, 'text/html', f"<html><body>{items}</body></html>".encode('utf-8'))
+            return
+
+        name = unquote(self.path[len('/stream/'):]) if self.path.startswith('/stream/') else None
+        if name not in sources:
+            self.send_body(404, 'text/plain', b"Unknown stream")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        interval = 1.0 / self.server.fps
+        try:
+            while not self.server.stop_event.is_set():
+                frame = sources[name].peek()
+                if frame is not None:
+                    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.server.quality])
+                    if ok:
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode('ascii'))
+                        self.wfile.write(jpeg.tobytes())
+                        self.wfile.write(b"\r\n")
+                        self.wfile.flush()
+                time.sleep(interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # viewer closed the page
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Debug stream: {format % args}")
+
+
+class DebugStreamServer:
+    """Serves LatestFrame sources ({name: LatestFrame}) as MJPEG streams on a background thread."""
+
+    def __init__(self, sources, port=8090, fps=2.0, quality=70):
+        self.sources = sources
+        self.port = port
+        self.fps = fps
+        self.quality = quality  # JPEG quality 0-100
+        self._httpd = None
+
+    def start(self):
+        httpd = ThreadingHTTPServer(('', self.port), DebugStreamHandler)
+        httpd.daemon_threads = True
+        httpd.sources = self.sources
+        httpd.fps = self.fps
+        httpd.quality = self.quality
+        httpd.stop_event = threading.Event()
+        self._httpd = httpd
+        threading.Thread(target=httpd.serve_forever, name="debug-stream", daemon=True).start()
+        logging.info(f"Debug stream on http://localhost:{httpd.server_address[1]}/")
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.stop_event.set()
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
@@ -0,0 +1,114 @@
+"""
+Confidence-aware digit decoding, constrained to the roster.
+
+Keeping any OCR string that is exactly number_length digits once the rest is stripped throws
+away the confidence the engine reported, so every read is as good as any other and only the
+debouncer's second vote keeps misreads out. DigitDecoder instead:
+
+    - drops detections below min_confidence
+    - snaps what is left to the roster: an exact roster number is kept, a string one edit away
+      (a wrong, missing or extra digit) from exactly one roster number becomes that number, and
+      anything else is dropped
+    - marks exact roster matches read with at least trust_confidence as trusted, so the debouncer
+      posts them from the first frame, as it does for QR reads
+
+Snapping uses NumberIndex, a map from every string one edit away from a roster number to that
+number, built once when the roster is loaded, so a lookup is one dict access no matter how big
+the roster is. Without a roster the decoder only applies the confidence floor and the length check.
+
+The decoded numbers are Read objects: plain strings everywhere else (posting, the debouncer's
+dicts, JSON) that also carry the confidence and the trusted flag.
+"""
+
+import csv
+import logging
+
+DIGITS = '0123456789'
+
+
+class Read(str):
+    """A decoded number (a plain str to everything else) with the OCR confidence behind it."""
+
+    def __new__(cls, number, confidence=1.0, trusted=False):
+        read = super().__new__(cls, number)
+        read.confidence = confidence
+        read.trusted = trusted  # good enough to post without a second frame agreeing
+        return read
+
+
+def load_numbers(path):
+    """Reads the valid numbers from a roster CSV ('number' column) or a plain file with one number per line."""
+    with open(path, newline='') as f:
+        rows = [row for row in csv.reader(f) if row and row[0].strip()]
+    column = 0
+    if rows and 'number' in [cell.strip().lower() for cell in rows[0]]:
+        column = [cell.strip().lower() for cell in rows[0]].index('number')
+        rows = rows[1:]
+    numbers = {row[column].strip() for row in rows if len(row) > column and row[column].strip().isdigit()}
+    logging.info(f"Loaded {len(numbers)} valid numbers from {path}")
+    return numbers
+
+
+def edits(number):
+    """Every digit string one substitution, deletion or insertion away from number."""
+    variants = set()
+    for i in range(len(number) + 1):
+        if i < len(number):
+            variants.add(number[:i] + number[i + 1:])
+            variants.update(number[:i] + digit + number[i + 1:] for digit in DIGITS)
+        variants.update(number[:i] + digit + number[i:] for digit in DIGITS)
+    variants.discard(number)
+    return variants
+
+
+class NumberIndex:
+    """The valid numbers plus a precomputed edit-distance-1 neighbour map for snapping reads to them."""
+
+    def __init__(self, numbers):
+        self.numbers = frozenset(numbers)
+        self._neighbours = {}  # near miss -> the roster numbers it is one edit away from
+        for number in self.numbers:
+            for variant in edits(number):
+                if variant not in self.numbers:
+                    self._neighbours.setdefault(variant, set()).add(number)
+
+    def snap(self, text):
+        """Returns (number, distance) for an exact or unambiguous one-edit match, or None."""
+        if text in self.numbers:
+            return text, 0
+        candidates = self._neighbours.get(text)
+        if candidates is not None and len(candidates) == 1:
+            return next(iter(candidates)), 1
+        return None  # no roster number close by, or several equally close: don't guess
+
+
+class DigitDecoder:
+    """Turns (text, confidence) detections into Reads, most confident first."""
+
+    def __init__(self, number_length=3, numbers=None, min_confidence=0.0, trust_confidence=0.9):
+        self.number_length = number_length  # only checked when there is no roster
+        self.index = NumberIndex(numbers) if numbers is not None else None
+        self.min_confidence = min_confidence  # detections below this are ignored
+        self.trust_confidence = trust_confidence  # exact roster matches at or above this are trusted
+
+    def decode(self, detections):
+        reads = {}
+        for text, confidence in detections:
+            digits = ''.join(filter(str.isdigit, text))
+            if not digits or confidence < self.min_confidence:
+                continue
+            if self.index is None:
+                if len(digits) != self.number_length:
+                    continue
+                number, distance = digits, 0
+            else:
+                match = self.index.snap(digits)
+                if match is None:
+                    continue
+                number, distance = match
+                if distance:
+                    logging.info(f"Snapped OCR read '{digits}' to {number}")
+            trusted = self.index is not None and distance == 0 and confidence >= self.trust_confidence
+            if number not in reads or confidence > reads[number].confidence:
+                reads[number] = Read(number, confidence, trusted)
+        return sorted(reads.values(), key=lambda read: read.confidence, reverse=True)
@@ -0,0 +1,267 @@
+"""
+Asynchronous API dispatcher for recognized student numbers.
+
+submit() only puts the number on a queue; a background thread does the HTTP work over a
+pooled keep-alive requests.Session, with a timeout on every request and a bounded number
+of retries with exponential backoff. Numbers that still can't be delivered are appended to
+an on-disk spool (JSON Lines) and replayed once the server answers again, so nothing is lost
+while the server is down and the camera loop never waits on the network. Spooled numbers older
+than max_spool_age (an hour by default) are logged and dropped instead of replayed: after a long
+outage or a restart the next day, those cars are long gone from the pickup line.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from car_line.metrics import metrics
+
+DEFAULT_SPOOL_FILE = f"{os.path.dirname(__file__)}/../../data/post_spool.jsonl"
+
+# Status codes that mean "the server doesn't know the batch format", so we fall back to single posts.
+# A 400 is a rejected payload, not a missing endpoint: it is logged and dropped like any other failed post.
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+class ApiDispatcher:
+    """Posts student numbers from a background thread with pooling, retries and an on-disk spool."""
+
+    def __init__(self, endpoint, timeout=(2.0, 5.0), max_retries=3, backoff=0.5, pool_size=4,
+                 batch_size=1, batch_endpoint=None, spool_file=DEFAULT_SPOOL_FILE, replay_interval=30.0,
+                 max_spool_age=3600.0):
+        self.endpoint = endpoint
+        self.timeout = timeout  # (connect, read) seconds
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_size = batch_size  # > 1 sends several numbers per request as {"student_numbers": [...]}
+        self.batch_endpoint = batch_endpoint or endpoint
+        self.spool_file = spool_file
+        self.replay_interval = replay_interval
+        self.max_spool_age = max_spool_age  # seconds a spooled number stays worth replaying (None: forever)
+
+        # One session keeps connections alive between posts instead of opening a new TCP connection each time
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.student_names = {}  # number -> last student_name the server returned for it
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._last_replay = 0.0
+        self._spooled_at = {}  # (number, lane) -> when a replayed number was first spooled, kept if it is re-spooled
+
+        self._stats_lock = threading.Lock()
+        self._posted = 0
+        self._failed = 0
+        self._spooled = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    def start(self):
+        """Starts the posting thread."""
+        metrics.gauge('dispatch_queue_depth', self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, name="dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stops the posting thread. Anything still queued is written to the spool."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._spool(leftover)
+        self.session.close()
+
+    def submit(self, number, captured_at=None, lane=None):
+        """
+        Queues a number for posting and returns immediately. captured_at is a time.monotonic() timestamp;
+        lane is the id of the camera that read it, sent along when several lanes share one dispatcher.
+        """
+        self._queue.put((number, captured_at, lane))
+
+    def stats(self):
+        """Returns queue depth, post counters and post latency (seconds)."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "posted": self._posted,
+                "failed": self._failed,
+                "spooled": self._spooled,
+                "latency_last": self._latency_last,
+                "latency_avg": self._latency_total / self._posted if self._posted else 0.0,
+                "latency_max": self._latency_max,
+            }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if time.monotonic() - self._last_replay > self.replay_interval:
+                    self._replay_spool()
+                continue
+
+            items = [first]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._send(items) and time.monotonic() - self._last_replay > 1.0:
+                # The server is reachable again, so try to deliver anything that was spooled while it was down
+                self._replay_spool()
+
+    def _send(self, items):
+        """Posts a group of (number, captured_at, lane) items. Returns True if the server accepted them."""
+        if len(items) > 1:
+            payload = {'student_numbers': [number for number, _, _ in items]}
+            if any(lane is not None for _, _, lane in items):
+                payload['lanes'] = [lane for _, _, lane in items]
+            response = self._post_with_retry(self.batch_endpoint, payload)
+            if response is not None and response.status_code in BATCH_UNSUPPORTED_STATUSES:
+                logging.warning(f"Server rejected batch post ({response.status_code}), falling back to single posts")
+                self.batch_size = 1
+                return all([self._send([item]) for item in items])
+        else:
+            payload = {'student_number': items[0][0]}
+            if items[0][2] is not None:
+                payload['lane'] = items[0][2]
+            response = self._post_with_retry(self.endpoint, payload)
+
+        if response is None:
+            self._spool(items)
+            return False
+
+        if response.status_code != 200:
+            logging.error(f"API Error: {response.status_code}, {response.text}")
+            metrics.inc('post_failures', len(items))
+            with self._stats_lock:
+                self._failed += len(items)
+            return False
+
+        self._record_success(items, response)
+        return True
+
+    def _post_with_retry(self, url, payload):
+        """Posts payload, retrying connection errors and 5xx responses. Returns the response or None."""
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                metrics.inc('post_retries')
+            try:
+                with metrics.time('post'):
+                    response = self.session.post(url, json=payload, timeout=self.timeout)
+                if response.status_code < 500:
+                    return response
+                logging.warning(f"API Error: {response.status_code} (attempt {attempt + 1})")
+            except requests.exceptions.RequestException as e:
+                response = None
+                logging.warning(f"API Request Exception: {e} (attempt {attempt + 1})")
+
+            if attempt < self.max_retries and self._stop_event.wait(self.backoff * 2 ** attempt):
+                break
+        return response if response is not None and response.status_code < 500 else None
+
+    def _record_success(self, items, response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        names = {}
+        if isinstance(body, dict):
+            if 'student_name' in body and len(items) == 1:
+                names[items[0][0]] = body['student_name']
+            for result in body.get('results', []):
+                if isinstance(result, dict) and 'student_number' in result:
+                    names[result['student_number']] = result.get('student_name', 'Unknown')
+
+        now = time.monotonic()
+        for number, captured_at, lane in items:
+            self._spooled_at.pop((number, lane), None)
+            student_name = names.get(number, 'Unknown')
+            self.student_names[number] = student_name
+            message = f"Student Number: {number}, Student Name: {student_name}"
+            if lane is not None:
+                message += f", Lane: {lane}"
+            if captured_at is not None:
+                message += f" ({now - captured_at:.2f}s after capture)"
+                metrics.observe('capture_to_post', now - captured_at, lane)
+            logging.info(message)
+
+        metrics.inc('numbers_posted', len(items))
+        latency = response.elapsed.total_seconds()
+        with self._stats_lock:
+            self._posted += len(items)
+            self._latency_last = latency
+            self._latency_total += latency * len(items)
+            self._latency_max = max(self._latency_max, latency)
+
+    def _spool(self, items):
+        """Appends undeliverable numbers to the spool file."""
+        try:
+            with self._spool_lock, open(self.spool_file, 'a') as f:
+                for number, _, lane in items:
+                    entry = {'student_number': number, 'timestamp': self._spooled_at.pop((number, lane), time.time())}
+                    if lane is not None:
+                        entry['lane'] = lane
+                    f.write(json.dumps(entry) + "\n")
+            metrics.inc('numbers_spooled', len(items))
+            with self._stats_lock:
+                self._spooled += len(items)
+            logging.error(f"Could not reach {self.endpoint}, spooled {len(items)} number(s) to {self.spool_file}")
+        except OSError as e:
+            logging.error(f"Error writing post spool: {e}")
+
+    def _replay_spool(self):
+        """Moves spooled numbers back onto the queue. They are re-spooled if posting fails again."""
+        self._last_replay = time.monotonic()
+        with self._spool_lock:
+            if not os.path.exists(self.spool_file) or os.path.getsize(self.spool_file) == 0:
+                return
+            try:
+                with open(self.spool_file, 'r') as f:
+                    lines = f.readlines()
+                open(self.spool_file, 'w').close()
+            except OSError as e:
+                logging.error(f"Error reading post spool: {e}")
+                return
+
+        replayed = expired = 0
+        now = time.time()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a torn line from a crash mid-write
+            number, lane = entry['student_number'], entry.get('lane')
+            spooled_at = entry.get('timestamp', now)
+            if self.max_spool_age is not None and now - spooled_at > self.max_spool_age:
+                logging.warning(f"Dropping spooled number {number} from {time.ctime(spooled_at)}, "
+                                f"too old to post")
+                expired += 1
+                continue
+            self._spooled_at[(number, lane)] = spooled_at
+            self._queue.put((number, None, lane))
+            replayed += 1
+        if expired:
+            metrics.inc('spool_expired', expired)
+        with self._stats_lock:
+            self._spooled -= min(self._spooled, replayed + expired)
+        logging.info(f"Replaying {replayed} spooled number(s)")
@@ -0,0 +1,113 @@
+"""
+Pickup card localization.
+
+The contour / aspect-ratio / solidity card finder from car_line_v1.process_frame, made into
+a reusable stage. Detection runs on a small downscaled copy of the frame, and the card quad it
+finds is perspective-warped out of the full resolution frame into a small canonical image, so
+OCR only has to look at the card instead of the whole lane.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+PAPER_ASPECT_RATIO = 11 / 8.5
+
+
+def order_corners(pts):
+    """Orders 4 points as top-left, top-right, bottom-right, bottom-left."""
+    pts = np.asarray(pts, dtype=np.float32).reshape(4, 2)
+    ordered = np.zeros((4, 2), dtype=np.float32)
+    s = pts.sum(axis=1)
+    d = np.diff(pts, axis=1).ravel()
+    ordered[0] = pts[np.argmin(s)]
+    ordered[2] = pts[np.argmax(s)]
+    ordered[1] = pts[np.argmin(d)]
+    ordered[3] = pts[np.argmax(d)]
+    return ordered
+
+
+class CardLocalizer:
+    """Finds the pickup card in a frame and returns it as a flat, canonical-size grayscale crop."""
+
+    def __init__(self, aspect_ratio=PAPER_ASPECT_RATIO, aspect_tolerance=0.2, min_area_fraction=0.01,
+                 max_area_fraction=0.8, min_solidity=0.8, detect_width=320, out_width=440, out_height=340):
+        self.aspect_ratio = aspect_ratio
+        self.aspect_tolerance = aspect_tolerance
+        # Areas are fractions of the frame so the same settings work at any camera resolution
+        self.min_area_fraction = min_area_fraction
+        self.max_area_fraction = max_area_fraction
+        self.min_solidity = min_solidity
+        self.detect_width = detect_width  # width of the downscaled copy used to find the card
+        self.out_width = out_width
+        self.out_height = out_height
+
+    @staticmethod
+    def _corners_for(width, height):
+        return np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+
+    def locate(self, gray):
+        """Returns the card corners (tl, tr, br, bl) in full frame coordinates, or None."""
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.detect_width / width)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+        blurred = cv2.GaussianBlur(small, (5, 5), 0)
+        edged = cv2.Canny(blurred, 75, 200)
+        edged = cv2.dilate(edged, None)  # close small gaps in the card outline
+        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        frame_area = small.shape[0] * small.shape[1]
+        min_area = self.min_area_fraction * frame_area
+        max_area = self.max_area_fraction * frame_area
+        best = None
+        best_area = 0
+        for c in contours:
+            #Area and Solidity filters
+            area = cv2.contourArea(c)
+            if area < min_area or area > max_area or area <= best_area:
+                continue
+
+            hull_area = cv2.contourArea(cv2.convexHull(c))
+            if hull_area == 0 or area / hull_area < self.min_solidity:
+                continue
+
+            peri = cv2.arcLength(c, True)
+            approx = cv2.approxPolyDP(c, 0.04 * peri, True)
+            if len(approx) != 4:
+                continue
+
+            # minAreaRect copes with a tilted card, and the card may be held portrait or landscape
+            (_, _), (w, h), _ = cv2.minAreaRect(approx)
+            if min(w, h) == 0:
+                continue
+            ratio = max(w, h) / min(w, h)
+            if abs(ratio - self.aspect_ratio) > self.aspect_tolerance * self.aspect_ratio:
+                continue
+
+            best = approx
+            best_area = area
+
+        if best is None:
+            return None
+        return order_corners(best / scale)
+
+    def crop(self, frame):
+        """Returns the perspective-corrected card as a grayscale image, or None if no card is found."""
+        try:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            corners = self.locate(gray)
+            if corners is None:
+                return None
+
+            # Keep the card's orientation: a card held portrait comes out portrait
+            top = np.linalg.norm(corners[1] - corners[0])
+            side = np.linalg.norm(corners[3] - corners[0])
+            width, height = (self.out_height, self.out_width) if side > top else (self.out_width, self.out_height)
+
+            matrix = cv2.getPerspectiveTransform(corners, self._corners_for(width, height))
+            return cv2.warpPerspective(gray, matrix, (width, height))
+        except Exception as e:
+            logging.error(f"Error during card localization: {e}")
+            return None
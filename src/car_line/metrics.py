@@ -0,0 +1,234 @@
+"""
+Per-stage timing and counters.
+
+Every stage reports into the module-level `metrics` registry:
+
+    timings  - capture, motion, fast_decode, preprocess, ocr, post and capture_to_post, each kept as a rolling
+               window of the last samples so p50 / p95 / p99 reflect what the lane is doing now
+    counters - frames, motion checks and triggers, OCR calls, numbers read and posted, post
+               failures, spooled posts, dropped frames
+    gauges   - queue depths, read when the metrics are exported
+
+Metrics are labeled with the lane they came from (when there is more than one). They can be
+scraped in the Prometheus text format from MetricsServer (http://<lane box>:<port>/metrics), or
+written as one JSON log line every so often by MetricsLogger, so regressions show up across lanes
+without anyone tailing free-form log lines.
+
+Recording a sample is a lock and a deque append; percentiles are only computed on export.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (50, 95, 99)
+
+
+class RollingTimer:
+    """The last `window` durations of one stage, plus running totals."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+
+def percentiles(samples, quantiles=QUANTILES):
+    """Nearest-rank percentiles (p50 / p95 / p99 by default) of a list of samples, keyed by p."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {p: 0.0 for p in quantiles}
+    return {p: ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))] for p in quantiles}
+
+
+class Metrics:
+    """Thread-safe registry of timings, counters and gauges, keyed by (name, lane)."""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def inc(self, name, value=1, lane=None):
+        with self._lock:
+            self._counters[(name, lane)] = self._counters.get((name, lane), 0) + value
+
+    def observe(self, name, seconds, lane=None):
+        with self._lock:
+            timer = self._timers.get((name, lane))
+            if timer is None:
+                timer = self._timers[(name, lane)] = RollingTimer(self.window)
+            timer.observe(seconds)
+
+    @contextmanager
+    def time(self, name, lane=None):
+        """with metrics.time('ocr'): ... records how long the block took."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, lane)
+
+    def gauge(self, name, read, lane=None):
+        """Registers read() -> number, called on export (e.g. a queue's qsize)."""
+        with self._lock:
+            self._gauges[(name, lane)] = read
+
+    def _copy(self):
+        # Copies are taken under the lock; the sorting for percentiles happens outside it
+        with self._lock:
+            timers = {key: (list(timer.samples), timer.count, timer.total) for key, timer in self._timers.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        timers = {key: (percentiles(samples), count, total) for key, (samples, count, total) in timers.items()}
+        return timers, counters, gauges
+
+    def snapshot(self):
+        """Returns {'timings': ..., 'counters': ..., 'gauges': ...} with 'name' or 'name{lane}' keys."""
+        timers, counters, gauges = self._copy()
+        timings = {}
+        for key, (quantiles, count, total) in timers.items():
+            timings[_label(key)] = dict({f"p{p}": round(v, 6) for p, v in quantiles.items()}, count=count)
+        return {
+            'timings': timings,
+            'counters': {_label(key): value for key, value in counters.items()},
+            'gauges': {_label(key): _read_gauge(read) for key, read in gauges.items()},
+        }
+
+    def prometheus(self, prefix='car_line'):
+        """Renders every metric in the Prometheus text exposition format."""
+        timers, counters, gauges = self._copy()
+
+        lines = []
+        for name in sorted({name for name, _ in timers}):
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            for (timer_name, lane), (quantiles, count, total) in sorted(timers.items(), key=_sort_key):
+                if timer_name != name:
+                    continue
+                for p, value in quantiles.items():
+                    lines.append(f"{prefix}_{name}_seconds{_labels(lane, quantile=p / 100)} {value:.6f}")
+                lines.append(f"{prefix}_{name}_seconds_count{_labels(lane)} {count}")
+                lines.append(f"{prefix}_{name}_seconds_sum{_labels(lane)} {total:.6f}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter_name, lane), value in sorted(counters.items(), key=_sort_key):
+                if counter_name == name:
+                    lines.append(f"{prefix}_{name}_total{_labels(lane)} {value}")
+        for name in sorted({name for name, _ in gauges}):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for (gauge_name, lane), read in sorted(gauges.items(), key=_sort_key):
+                if gauge_name == name:
+                    lines.append(f"{prefix}_{name}{_labels(lane)} {_read_gauge(read)}")
+        return "\n".join(lines) + "\n"
+
+
+def _label(key):
+    name, lane = key
+    return name if lane is None else f"{name}{{{lane}}}"
+
+
+def _labels(lane, quantile=None):
+    labels = []
+    if lane is not None:
+        labels.append(f'lane="{lane}"')
+    if quantile is not None:
+        labels.append(f'quantile="{quantile:g}"')
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _sort_key(item):
+    name, lane = item[0]
+    return name, "" if lane is None else str(lane)
+
+
+def _read_gauge(read):
+    try:
+        return read()
+    except Exception:
+        return 0
+
+
+# The registry every stage reports into
+metrics = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = self.server.metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Metrics: {format % args}")
+
+
+class MetricsServer:
+    """Serves /metrics in the Prometheus text format on a background thread."""
+
+    def __init__(self, registry=metrics, port=9108):
+        self.registry = registry
+        self.port = port
+        self._httpd = None
+
+    def start(self):
+        httpd = ThreadingHTTPServer(('', self.port), MetricsHandler)
+        httpd.daemon_threads = True
+        httpd.metrics = self.registry
+        self._httpd = httpd
+        threading.Thread(target=httpd.serve_forever, name="metrics", daemon=True).start()
+        logging.info(f"Metrics on http://localhost:{httpd.server_address[1]}/metrics")
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class MetricsLogger:
+    """Logs a metrics snapshot as one JSON line every interval seconds (and once more on stop)."""
+
+    def __init__(self, registry=metrics, interval=60.0):
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        self.log()
+
+    def log(self):
+        logging.info(f"Metrics: {json.dumps(self.registry.snapshot(), sort_keys=True)}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.log()
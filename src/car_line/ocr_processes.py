@@ -0,0 +1,135 @@
+"""
+OCR in worker processes.
+
+EasyOCR / torch inference on the CPU holds the GIL for long stretches, so running it on a thread
+in the camera process slows down capture and motion checks, and only one core does OCR at a time.
+ProcessPoolRecognizer runs a recognizer in each of N worker processes instead. Each worker builds
+its recognizer (and loads its model) once, when the pool starts.
+
+Frames are not pickled across: the parent copies each frame into a reusable
+multiprocessing.shared_memory block and only sends the block's name and the frame's shape, and
+the worker reads the frame straight out of the shared block. Only the recognized numbers come back.
+
+Several OCR threads (OcrPool workers) are needed to keep several processes busy at once.
+"""
+
+import concurrent.futures
+import logging
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from car_line.recognizers import Recognizer
+
+# Set in each worker process by _init_worker
+_recognizer = None
+_attached = {}  # shared memory blocks this worker has opened, by name
+
+
+def _init_worker(factory, args):
+    global _recognizer
+    _recognizer = factory(*args)
+    _recognizer.start()
+
+
+def _attach(name):
+    block = _attached.get(name)
+    if block is None:
+        if len(_attached) > 64:
+            _attached.clear()  # slots the parent has since replaced with bigger ones
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+    return block
+
+
+def _recognize_shared(name, shape, dtype):
+    """Runs in a worker: recognizes the frame sitting in shared memory block `name`."""
+    frame = np.ndarray(shape, dtype=dtype, buffer=_attach(name).buf)
+    return _recognizer.recognize(frame), _recognizer.failed
+
+
+class SharedFrameSlot:
+    """A shared memory block one frame at a time is copied into for a worker to read."""
+
+    def __init__(self, size):
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+
+    def write(self, frame):
+        """Copies frame into the block (growing it if needed). Returns the worker call's arguments."""
+        if frame.nbytes > self.block.size:
+            self.close()
+            self.block = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.block.buf)[...] = frame
+        return self.block.name, frame.shape, frame.dtype.str
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+
+class ProcessPoolRecognizer(Recognizer):
+    """
+    Runs factory(*args) -> Recognizer in `processes` worker processes and hands frames to them.
+
+    factory has to be importable by the workers (a module level function such as
+    car_line_v4.build_recognizer), since they are started with 'spawn' to keep torch's threads
+    out of a forked camera process. The recognizer's preview is not shown in this mode; it lives
+    in the workers.
+    """
+
+    def __init__(self, factory, args=(), processes=2, frame_bytes=640 * 480 * 3):
+        super().__init__()
+        self.factory = factory
+        self.args = args
+        self.processes = processes
+        self.frame_bytes = frame_bytes  # initial slot size; slots grow if frames are bigger
+
+        self._executor = None
+        self._slots = queue.Queue()
+        self._failed = False
+
+    @property
+    def failed(self):
+        return self._failed
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.factory, self.args))
+        # Two slots per worker, so the next frame can be copied in while a worker is busy
+        for _ in range(2 * self.processes):
+            self._slots.put(SharedFrameSlot(self.frame_bytes))
+        logging.info(f"Started {self.processes} OCR worker processes")
+
+    def recognize(self, frame):
+        self.start()
+        slot = self._slots.get()  # blocks while every slot is in use, which bounds the backlog
+        try:
+            frame = np.ascontiguousarray(frame)
+            numbers, failed = self._executor.submit(_recognize_shared, *slot.write(frame)).result()
+            if failed:
+                self._failed = True
+            return numbers
+        except concurrent.futures.process.BrokenProcessPool as e:
+            logging.error(f"OCR worker process died: {e}")
+            self._failed = True
+            return []
+        except Exception as e:
+            logging.error(f"Error during digit recognition in worker process: {e}")
+            return []
+        finally:
+            self._slots.put(slot)
+
+    def close(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        while True:
+            try:
+                self._slots.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,94 @@
+"""
+Lazy EasyOCR loading.
+
+Importing easyocr pulls in torch, and building a Reader loads the detector and recognizer
+weights, which takes several seconds. LazyReader does all of that on a background thread, so
+the camera, preview and motion detection start immediately; OCR calls made before the model is
+ready simply wait for it. Once loaded, the model is warmed up on a synthetic card so the first
+real car doesn't pay for lazy torch initialization.
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def synthetic_card(number="123", width=440, height=340):
+    """Draws a plain white card with a black number on it, used to warm up the OCR model."""
+    card = np.full((height, width), 255, dtype=np.uint8)
+    cv2.putText(card, number, (width // 6, height * 2 // 3), cv2.FONT_HERSHEY_SIMPLEX, 4, 0, 12)
+    return card
+
+
+class LazyReader:
+    """Stands in for easyocr.Reader and loads the real one in the background."""
+
+    def __init__(self, languages=('en',), gpu=False, model_dir=None, user_network_dir=None,
+                 recog_network='standard', quantize=True, warm_up=True):
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.model_dir = model_dir  # local model cache; when set, nothing is downloaded at startup
+        self.user_network_dir = user_network_dir  # where a custom (e.g. digits-only) recognizer lives
+        self.recog_network = recog_network
+        self.quantize = quantize  # dynamic int8 quantization of the CPU model
+        self.warm_up = warm_up
+
+        self.ready = threading.Event()
+        self.error = None
+        self._reader = None
+        self._thread = None
+
+    def start_loading(self):
+        """Starts loading the model on a background thread. Safe to call more than once."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load, name="easyocr-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def get(self, timeout=None):
+        """Returns the loaded easyocr.Reader, waiting for it if needed."""
+        self.start_loading()
+        if not self.ready.wait(timeout):
+            raise TimeoutError("EasyOCR reader is still loading")
+        if self.error is not None:
+            raise RuntimeError(f"EasyOCR reader failed to load: {self.error}")
+        return self._reader
+
+    def readtext(self, image, **kwargs):
+        return self.get().readtext(image, **kwargs)
+
+    def readtext_batched(self, images, **kwargs):
+        return self.get().readtext_batched(images, **kwargs)
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            import easyocr  # imported here so torch is only loaded on this thread
+
+            reader_kwargs = {
+                'gpu': self.gpu,
+                'recog_network': self.recog_network,
+                'quantize': self.quantize,
+                'verbose': False,
+            }
+            if self.model_dir is not None:
+                reader_kwargs['model_storage_directory'] = self.model_dir
+                reader_kwargs['download_enabled'] = False
+            if self.user_network_dir is not None:
+                reader_kwargs['user_network_directory'] = self.user_network_dir
+
+            self._reader = easyocr.Reader(self.languages, **reader_kwargs)
+            logging.info(f"EasyOCR reader initialized successfully in {time.perf_counter() - start:.1f}s.")
+
+            if self.warm_up:
+                warm_start = time.perf_counter()
+                self._reader.readtext(synthetic_card())
+                logging.info(f"EasyOCR warm-up took {time.perf_counter() - warm_start:.2f}s.")
+        except Exception as e:
+            self.error = e
+            logging.error(f"Error initializing EasyOCR reader: {e}")
+        finally:
+            self.ready.set()
@@ -0,0 +1,356 @@
+"""
+Threaded car line pipeline.
+
+Capture, OCR and posting each run on their own thread so a slow OCR pass or a hung
+API endpoint never stalls the camera:
+
+    capture thread -> LatestFrame -> FrameScheduler / motion check -> OcrPool -> post queue -> post worker
+
+The camera is always drained into LatestFrame, so the motion check only ever looks at
+the newest frame. Frames waiting for OCR sit in a small drop-oldest queue, so when OCR
+falls behind we skip stale frames instead of building up a backlog.
+
+Several lanes (one CarLinePipeline per camera) can share one OcrPool, so the OCR model is
+loaded once per process and memory grows with the number of OCR workers, not cameras.
+
+With a CardTracker (car_line.tracker) the motion stage no longer sends every frame with motion
+to OCR, only the sharpest frame of each tracked card.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from car_line.metrics import metrics
+from car_line.scheduler import FrameScheduler
+
+
+class LatestFrame:
+    """Holds only the most recent frame. Writers overwrite, readers wait for something newer."""
+
+    def __init__(self, reused_after=None):
+        # With a camera that reads into rotating buffers (car_line.capture), the number of frames
+        # after which a frame's array is overwritten; None if frames are never reused
+        self.reused_after = reused_after
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+
+    def put(self, frame, timestamp=None):
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._timestamp = time.monotonic() if timestamp is None else timestamp
+            self._cond.notify_all()
+
+    def get(self, last_seq=0, timeout=None):
+        """Waits for a frame newer than last_seq. Returns (seq, timestamp, frame) or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq, timeout):
+                return None
+            return self._seq, self._timestamp, self._frame
+
+    def recycled(self, seq):
+        """
+        True if the camera may already be reading a newer frame into frame seq's array. Check it
+        after copying (or otherwise using) the frame and drop the frame if it was.
+        """
+        if self.reused_after is None:
+            return False
+        with self._cond:
+            # The array comes back around once reused_after - 1 newer frames are in
+            return self._seq - seq >= self.reused_after - 1
+
+    def peek(self):
+        """Returns the current frame without waiting (None if nothing has been put yet)."""
+        with self._cond:
+            return self._frame
+
+
+class DropOldestQueue:
+    """Bounded FIFO queue. When full, put() discards the oldest item instead of blocking."""
+
+    def __init__(self, maxsize):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest item, or None if nothing arrives within timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return None
+            return self._items.popleft()
+
+    def get_batch(self, max_items, max_wait, timeout=None):
+        """
+        Waits up to timeout for a first item, then up to max_wait more seconds for the batch to fill.
+        Returns a list of 1..max_items items, or [] if nothing arrived.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return []
+            deadline = time.monotonic() + max_wait
+            while len(self._items) < max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    break
+            return [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def full(self):
+        with self._cond:
+            return len(self._items) == self._items.maxlen
+
+
+class CaptureThread(threading.Thread):
+    """Reads the camera as fast as it delivers frames and keeps only the latest one."""
+
+    def __init__(self, cap, latest, stop_event, lane_id=None):
+        super().__init__(name="capture" if lane_id is None else f"capture-{lane_id}", daemon=True)
+        self.cap = cap
+        self.latest = latest
+        self.stop_event = stop_event
+        self.lane_id = lane_id
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with metrics.time('capture', self.lane_id):  # mostly waiting on the camera, so ~1/fps when healthy
+                ret, frame = self.cap.read()
+            if not ret:
+                logging.error("Error: Could not read frame")
+                self.stop_event.set()
+                break
+            metrics.inc('frames', lane=self.lane_id)
+            self.latest.put(frame)
+
+
+class OcrPool:
+    """
+    OCR workers fed from one drop-oldest queue. Each queued frame remembers the pipeline it came
+    from, so results go back to the right lane's debouncer and post queue.
+    """
+
+    def __init__(self, recognize, recognize_batch=None, workers=1, queue_size=2, batch_size=1, batch_max_wait=0.25):
+        self.recognize = recognize  # recognize(frame) -> list of numbers
+        # recognize_batch(frames) -> one list of numbers per frame. Used when batch_size > 1 so several
+        # motion frames share one OCR call; batch_max_wait caps how long the first frame waits for company.
+        self.recognize_batch = recognize_batch
+        self.batch_size = batch_size if recognize_batch is not None else 1
+        self.batch_max_wait = batch_max_wait
+        self.workers = workers
+
+        self.stop_event = threading.Event()
+        self.queue = DropOldestQueue(max(queue_size, self.batch_size))
+        self._threads = []
+
+    def start(self):
+        metrics.gauge('ocr_queue_depth', self.queue.qsize)
+        metrics.gauge('ocr_frames_dropped', lambda: self.queue.dropped)
+        self._threads = [threading.Thread(target=self._worker, name=f"ocr-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, pipeline, timestamp, frame, track_id=None):
+        self.queue.put((pipeline, timestamp, frame, track_id))
+
+    def full(self):
+        return self.queue.full()
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            if self.batch_size > 1:
+                batch = self.queue.get_batch(self.batch_size, self.batch_max_wait, timeout=0.5)
+            else:
+                item = self.queue.get(timeout=0.5)
+                batch = [item] if item is not None else []
+            batch = [(pipeline, timestamp, frame, track_id) for pipeline, timestamp, frame, track_id in batch
+                     if not pipeline.try_fast_decode(timestamp, frame, track_id)]
+            if not batch:
+                continue
+            with metrics.time('ocr'):
+                if len(batch) == 1:
+                    results = [self.recognize(batch[0][2])]
+                else:
+                    results = self.recognize_batch([frame for _, _, frame, _ in batch])
+            metrics.inc('ocr_calls')
+            metrics.inc('ocr_frames', len(batch))
+            for (pipeline, timestamp, _, track_id), numbers in zip(batch, results):
+                pipeline.handle_numbers(timestamp, numbers, track_id=track_id)
+
+
+class CarLinePipeline:
+    """Runs capture, motion detection, OCR and posting for one camera as separate stages."""
+
+    def __init__(self, cap, detect_motion, recognize, post, scheduler=None, ocr_queue_size=2, debouncer=None,
+                 recognize_batch=None, batch_size=1, batch_max_wait=0.25, fast_decode=None, ocr_pool=None,
+                 lane_id=None, tracker=None, quality_gate=None):
+        self.cap = cap
+        self.detect_motion = detect_motion  # detect_motion(frame) -> bool, e.g. MotionDetector.update
+        self.post = post  # post(number, captured_at) -> None, captured_at is the frame's time.monotonic()
+        self.scheduler = scheduler or FrameScheduler()  # picks which frames get a motion check
+        self.debouncer = debouncer  # optional NumberDebouncer between OCR and posting
+        # fast_decode(frame) -> numbers, e.g. a QR decoder. When it finds something OCR is skipped for
+        # that frame, and its reads are trusted without waiting for other frames to agree.
+        self.fast_decode = fast_decode
+        self.lane_id = lane_id  # shown in the log when several lanes run in one process
+        # Optional CardTracker: when set, OCR only sees the sharpest frame of each track instead of
+        # every frame with motion
+        self.tracker = tracker
+        self.quality_gate = quality_gate  # optional QualityGate: frames it rejects never reach OCR
+
+        # Without a shared pool the pipeline runs its own single OCR worker
+        self._owns_ocr_pool = ocr_pool is None
+        self.ocr_pool = ocr_pool or OcrPool(recognize, recognize_batch, workers=1, queue_size=ocr_queue_size,
+                                            batch_size=batch_size, batch_max_wait=batch_max_wait)
+
+        self.stop_event = threading.Event()
+        self.latest = LatestFrame(getattr(cap, 'buffers', None))
+        self.post_queue = queue.Queue()
+        self._threads = []
+
+    def start(self):
+        """Starts the capture and post threads (and the OCR worker, unless the pool is shared)."""
+        suffix = f"-{self.lane_id}" if self.lane_id is not None else ""
+        metrics.gauge('post_queue_depth', self.post_queue.qsize, self.lane_id)
+        self._threads = [
+            CaptureThread(self.cap, self.latest, self.stop_event, self.lane_id),
+            threading.Thread(target=self._post_worker, name=f"post{suffix}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        if self._owns_ocr_pool:
+            self.ocr_pool.start()
+
+    def stop(self, timeout=2.0):
+        """Signals every stage to stop and waits briefly for the threads to exit."""
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._owns_ocr_pool:
+            self.ocr_pool.stop(timeout)
+
+    def run(self, first_frame, on_frame=None):
+        """
+        Runs the motion stage on the calling thread until stopped.
+
+        on_frame(frame) is called with every captured frame (e.g. to show it with cv2.imshow, which
+        has to happen on the main thread). Returning False from it stops the pipeline. Without
+        on_frame, this thread sleeps until the scheduler says the next check is due.
+        """
+        self.detect_motion(first_frame)  # seed the background model
+        last_seq = 0
+        while not self.stop_event.is_set():
+            if on_frame is None:
+                wait = self.scheduler.wait_time(time.monotonic(), self.ocr_pool.full())
+                if wait > 0 and self.stop_event.wait(wait):
+                    break
+
+            item = self.latest.get(last_seq, timeout=0.5)
+            if item is None:
+                continue
+            last_seq, timestamp, frame = item
+
+            ocr_busy = self.ocr_pool.full()
+            if self.scheduler.due(timestamp, ocr_busy):
+                with metrics.time('motion', self.lane_id):
+                    motion = self.detect_motion(frame)
+                self.scheduler.record_check(timestamp, motion)
+                metrics.inc('motion_checks', lane=self.lane_id)
+                if motion:
+                    metrics.inc('motion_triggers', lane=self.lane_id)
+                if self.tracker is not None:
+                    # The tracker picks its own frames, and they are few enough to queue even when OCR is busy
+                    usable = motion and self._usable(frame)
+                    if self._recycled(last_seq):
+                        continue
+                    for track_id, best_timestamp, best_frame in self.tracker.update(
+                            timestamp, frame, motion, usable, recycled=lambda: self._recycled(last_seq)):
+                        logging.info(f"Reading track {track_id}{self._lane_label()}")
+                        self.ocr_pool.submit(self, best_timestamp, best_frame, track_id)
+                elif motion and not ocr_busy and self._usable(frame):
+                    # The camera may reuse this frame's buffer before OCR gets to it (car_line.capture)
+                    copy = frame.copy()
+                    if self._recycled(last_seq):
+                        continue
+                    logging.info(f"Motion detected{self._lane_label()}!")
+                    self.ocr_pool.submit(self, timestamp, copy)
+
+            if on_frame is not None and on_frame(frame) is False:
+                break
+        self.stop_event.set()
+
+    def _usable(self, frame):
+        return self.quality_gate is None or self.quality_gate.usable(frame)
+
+    def _recycled(self, seq):
+        # The capture thread got back around to frame seq's buffer while we were looking at it, so
+        # what we saw (or copied) may be half the next frame
+        if not self.latest.recycled(seq):
+            return False
+        metrics.inc('recycled_frames', lane=self.lane_id)
+        logging.debug(f"Dropping a frame the camera already reused{self._lane_label()}")
+        return True
+
+    def try_fast_decode(self, timestamp, frame, track_id=None):
+        """Runs the fast decoder on a frame. Returns True if it found numbers, so OCR can be skipped."""
+        if self.fast_decode is None:
+            return False
+        with metrics.time('fast_decode', self.lane_id):
+            numbers = self.fast_decode(frame)
+        if not numbers:
+            return False
+        metrics.inc('fast_decode_reads', lane=self.lane_id)
+        self.handle_numbers(timestamp, numbers, trusted=True, track_id=track_id)
+        return True
+
+    def handle_numbers(self, timestamp, numbers, trusted=False, track_id=None):
+        """Runs the numbers from one frame through the debouncer and queues them for posting."""
+        read = numbers
+        if numbers:
+            self.scheduler.mark_active(time.monotonic())  # keep sampling at full rate while a card is in view
+            metrics.inc('numbers_read', len(numbers), lane=self.lane_id)
+            trusted_reads = sum(1 for number in numbers if getattr(number, 'trusted', False))
+            if trusted_reads:
+                metrics.inc('numbers_trusted', trusted_reads, lane=self.lane_id)
+        if numbers and self.debouncer is not None:
+            numbers = self.debouncer.update(numbers, timestamp, confirm_frames=1 if trusted else None)
+        if track_id is not None and self.tracker is not None:
+            # The track is finished once everything it read has been posted (now or earlier)
+            posted = self.debouncer is None or all(self.debouncer.recently_posted(number, timestamp) for number in read)
+            self.tracker.record_result(track_id, read, done=bool(read) and posted)
+        if numbers:
+            metrics.inc('numbers_confirmed', len(numbers), lane=self.lane_id)
+            print(f"Numbers{self._lane_label()}: {numbers}")
+            for number in numbers:
+                self.post_queue.put((timestamp, number))
+
+    def _lane_label(self):
+        return f" (lane {self.lane_id})" if self.lane_id is not None else ""
+
+    def _post_worker(self):
+        while not self.stop_event.is_set():
+            try:
+                timestamp, number = self.post_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.post(number, timestamp)
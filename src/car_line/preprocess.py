@@ -0,0 +1,119 @@
+"""
+OCR preprocessing as a configured, allocation-free pipeline.
+
+The old per-call preprocessing built a new CLAHE object and kernel every frame, allocated a
+fresh full-ROI array for every step, and in v4's case computed a dilation and a CLAHE pass only
+to throw both away. Preprocessor is set up once from a list of steps: the kernels are built in
+__init__, the CLAHE object once per thread (it keeps scratch state, so threads can't share one),
+and each step writes into one of two preallocated buffers (ping-pong, via OpenCV's dst=
+arguments), so a frame costs no allocations after the first and only the steps that actually
+feed OCR run.
+
+Steps are names, or (name, size) for the kernel size ('name:size' on the command line):
+
+    threshold  adaptive Gaussian threshold (inverted: dark digits become white)
+    open       morphological opening, removes small specks
+    close      morphological closing, fills small gaps
+    dilate     dilation
+    median     median blur
+    clahe      contrast limited adaptive histogram equalization
+
+PRESETS holds the chains the car_line scripts have used, so they can be A/B tested against
+each other from config.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+PRESETS = {
+    'gray': (),  # car_line_v4: the grayscale ROI as is
+    'threshold': ('threshold', 'open', 'close'),  # car_line_v2 / v3
+    'card': ('threshold', ('median', 3), ('open', 2), 'clahe'),  # car_line_v1, for a card crop
+}
+
+STEPS = ('threshold', 'open', 'close', 'dilate', 'median', 'clahe')
+
+
+def parse_steps(text):
+    """Parses a preset name or comma-separated steps from the command line ('clahe,dilate:2'). None stays None."""
+    if text is None or text in PRESETS:
+        return text
+    steps = []
+    for step in text.split(','):
+        name, _, size = step.strip().partition(':')
+        steps.append((name, int(size)) if size else name)
+    return steps
+
+
+class Preprocessor:
+    """Grayscale conversion plus the configured steps, writing into reused per-thread buffers."""
+
+    def __init__(self, steps='gray', kernel_size=3, threshold_block_size=11, threshold_c=2, clahe_clip_limit=2.0,
+                 clahe_tile_grid=(8, 8)):
+        if isinstance(steps, str):
+            steps = PRESETS[steps]
+        self.steps = []
+        for step in steps:
+            name, size = (step, kernel_size) if isinstance(step, str) else step
+            if name not in STEPS:
+                raise ValueError(f"Unknown preprocessing step '{name}', choose from {STEPS}")
+            if name == 'median' and (size < 3 or size % 2 == 0):
+                # cv2.medianBlur only takes odd apertures, and would fail on every frame
+                raise ValueError(f"median size must be odd and at least 3, not {size}")
+            self.steps.append((name, size))
+
+        self.threshold_block_size = threshold_block_size
+        self.threshold_c = threshold_c
+        self._kernels = {size: np.ones((size, size), np.uint8) for name, size in self.steps if name != 'median'}
+        self.clahe_clip_limit = clahe_clip_limit
+        self.clahe_tile_grid = clahe_tile_grid
+        self._local = threading.local()  # OCR may run on several threads; each gets its own buffers and CLAHE
+
+    def __call__(self, image):
+        """
+        Returns the preprocessed grayscale image. The result lives in a buffer that is reused by
+        this thread's next call, so copy it if it has to outlive that.
+        """
+        if image.ndim == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._buffer('gray', image.shape[:2]))
+        else:
+            gray = image
+        if not self.steps:
+            return gray
+
+        src = gray
+        for i, (name, size) in enumerate(self.steps):
+            dst = self._buffer(i % 2, gray.shape)
+            if name == 'threshold':
+                cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV,
+                                      self.threshold_block_size, self.threshold_c, dst=dst)
+            elif name == 'open':
+                cv2.morphologyEx(src, cv2.MORPH_OPEN, self._kernels[size], dst=dst)
+            elif name == 'close':
+                cv2.morphologyEx(src, cv2.MORPH_CLOSE, self._kernels[size], dst=dst)
+            elif name == 'dilate':
+                cv2.dilate(src, self._kernels[size], dst=dst)
+            elif name == 'median':
+                cv2.medianBlur(src, size, dst=dst)
+            elif name == 'clahe':
+                self._clahe().apply(src, dst=dst)
+            src = dst
+        return src
+
+    def _clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.createCLAHE(clipLimit=self.clahe_clip_limit,
+                                                        tileGridSize=self.clahe_tile_grid)
+        return clahe
+
+    def _buffer(self, key, shape):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(key)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[key] = np.empty(shape, np.uint8)
+        return buffer
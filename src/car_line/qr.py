@@ -0,0 +1,47 @@
+"""
+QR code fast path.
+
+Decoding a QR code with OpenCV takes a few milliseconds, against hundreds for an EasyOCR pass,
+and a QR payload carries its own error correction. Cards that carry a QR code of the student
+number are read here and never reach the neural OCR; cards without one fall through to OCR.
+"""
+
+import logging
+import threading
+
+import cv2
+
+
+class QrDecoder:
+    """Decodes student numbers from QR codes with cv2.QRCodeDetector."""
+
+    def __init__(self, number_length=3):
+        self.number_length = number_length
+        self._local = threading.local()  # fast_decode runs on every OCR worker; each gets its own detector
+
+    @property
+    def detector(self):
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            detector = self._local.detector = cv2.QRCodeDetector()
+        return detector
+
+    def is_valid(self, text):
+        text = text.strip()
+        return len(text) == self.number_length and text.isdigit()
+
+    def decode(self, frame):
+        """Returns the valid student numbers found in QR codes in the frame (usually zero or one)."""
+        try:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            found, decoded_info, _, _ = self.detector.detectAndDecodeMulti(gray)
+            if not found:
+                return []
+            numbers = [text.strip() for text in decoded_info if text and self.is_valid(text)]
+            for text in decoded_info:
+                if text and not self.is_valid(text):
+                    logging.warning(f"Ignoring QR code that is not a student number: '{text}'")
+            return list(dict.fromkeys(numbers))
+        except Exception as e:
+            logging.error(f"Error during QR decoding: {e}")
+            return []
@@ -0,0 +1,85 @@
+"""
+Frame quality gate in front of OCR.
+
+Rain, glare and motion blur produce frames OCR is never going to read, and each one still costs
+a full EasyOCR pass once motion has fired. QualityGate looks at a downscaled grayscale copy of
+the frame first (well under a millisecond) and rejects it when:
+
+    blur    the variance of the Laplacian is below min_sharpness
+    dark    the mean brightness from the exposure histogram is below min_brightness
+    glare   more than max_clipped_fraction of the pixels are blown out (>= clip_level)
+    motion  more than max_motion_fraction of the picture changed at once, which is camera shake,
+            a lighting change or heavy rain rather than a car pulling up
+
+Rejected frames are not sent to OCR (with a CardTracker they are not picked as a track's best
+frame either, so OCR waits for a usable one). Each rejection is logged with its reason and
+counted in the metrics as rejected_<reason>.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+from car_line.metrics import metrics
+
+
+class QualityGate:
+    """Cheap sharpness / exposure / motion checks that decide whether a frame is worth OCR."""
+
+    def __init__(self, motion_detector=None, min_sharpness=20.0, min_brightness=30, clip_level=250,
+                 max_clipped_fraction=0.25, max_motion_fraction=0.6, width=320, lane_id=None):
+        self.motion_detector = motion_detector  # the lane's MotionDetector, for its last_fraction
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.clip_level = clip_level
+        self.max_clipped_fraction = max_clipped_fraction
+        self.max_motion_fraction = max_motion_fraction
+        self.width = width  # the checks run on a grayscale copy this many pixels wide
+        self.lane_id = lane_id
+        self._levels = np.arange(256, dtype=np.float32)
+        self._small = None
+        self._gray = None
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        self._small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if self._small.ndim == 2:
+            return self._small
+        self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def check(self, frame):
+        """Returns None for a usable frame, or (reason, details) for one OCR shouldn't bother with."""
+        if self.motion_detector is not None and self.motion_detector.last_fraction > self.max_motion_fraction:
+            return 'motion', f"{self.motion_detector.last_fraction:.0%} of the picture changed"
+
+        gray = self._thumbnail(frame)
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        pixels = gray.size
+        brightness = float(hist @ self._levels) / pixels
+        if brightness < self.min_brightness:
+            return 'dark', f"mean brightness {brightness:.0f}"
+        clipped = float(hist[self.clip_level:].sum()) / pixels
+        if clipped > self.max_clipped_fraction:
+            return 'glare', f"{clipped:.0%} of the pixels blown out"
+
+        _, stddev = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+        sharpness = float(stddev[0][0]) ** 2
+        if sharpness < self.min_sharpness:
+            return 'blur', f"sharpness {sharpness:.1f}"
+        return None
+
+    def usable(self, frame):
+        """check() plus the logging and metrics. Returns True if the frame should go to OCR."""
+        with metrics.time('quality', self.lane_id):
+            rejection = self.check(frame)
+        if rejection is None:
+            return True
+        reason, details = rejection
+        metrics.inc(f'rejected_{reason}', lane=self.lane_id)
+        lane = f" (lane {self.lane_id})" if self.lane_id is not None else ""
+        logging.info(f"Skipping OCR{lane}: {reason}, {details}")
+        return False
@@ -0,0 +1,212 @@
+"""
+Pluggable recognition backends.
+
+Every backend implements the Recognizer interface: recognize(frame) returns the student numbers
+found in a BGR frame, and recognize_batch(frames) does the same for several frames at once
+(backends that can't batch just loop). Backends are registered in RECOGNIZERS by name, so the
+car_line scripts and the benchmark harness can pick one at runtime with create_recognizer().
+
+    easyocr   - EasyOCR on the card crop or a fixed ROI (car_line_v3 / car_line_v4)
+    tesseract - Tesseract on the card crop or a fixed ROI (car_line_v1 / car_line_v2)
+    qr        - QR codes only, no OCR at all
+
+The OCR backends hand their detections and confidences to a DigitDecoder (car_line.decoding),
+which can snap them to the roster and mark confident reads as trusted.
+"""
+
+import logging
+
+from car_line.decoding import DIGITS, DigitDecoder
+from car_line.metrics import metrics
+from car_line.preprocess import Preprocessor
+from car_line.qr import QrDecoder
+
+
+class Recognizer:
+    """Common interface for the recognition backends."""
+
+    name = None
+
+    def __init__(self, number_length=3, preview=None):
+        self.number_length = number_length
+        self.preview = preview  # optional LatestFrame that receives the image handed to the engine
+
+    @property
+    def failed(self):
+        """True if the backend can't recognize anything (e.g. its model failed to load)."""
+        return False
+
+    def start(self):
+        """Starts any slow initialization (model loading) in the background."""
+
+    def close(self):
+        """Releases anything the backend holds on to (e.g. worker processes)."""
+
+    def recognize(self, frame):
+        """Returns the student numbers found in a BGR frame."""
+        raise NotImplementedError
+
+    def recognize_batch(self, frames):
+        """Returns one list of numbers per frame. Backends that can batch override this."""
+        return [self.recognize(frame) for frame in frames]
+
+
+class RegionRecognizer(Recognizer):
+    """Base for OCR backends: crops the card (or a fixed ROI) and preprocesses it before OCR."""
+
+    def __init__(self, roi=None, localizer=None, fallback_to_roi=True, preprocess='gray', number_length=3,
+                 preview=None, decoder=None):
+        """
+        preprocess is a car_line.preprocess preset name ('gray', 'threshold', 'card') or a list of steps.
+        decoder is a DigitDecoder; the default has no roster or confidence floor and keeps number_length digit reads.
+        """
+        super().__init__(number_length, preview)
+        self.decoder = decoder or DigitDecoder(number_length)
+        self.roi = roi  # (x, y, width, height), or None for the whole frame
+        self.localizer = localizer  # optional CardLocalizer; its crop is used instead of the ROI
+        self.fallback_to_roi = fallback_to_roi  # OCR the ROI when no card is found (False skips the frame)
+        self.preprocess = preprocess if isinstance(preprocess, Preprocessor) else Preprocessor(preprocess)
+
+    def prepare(self, frame, copy=False):
+        """
+        Returns the preprocessed grayscale image to OCR, or None to skip the frame. The image is
+        a reused buffer unless copy is True (needed when several frames are prepared before OCR).
+        """
+        with metrics.time('preprocess'):
+            image = self._prepare(frame)
+        if image is not None and copy:
+            image = image.copy()
+        return image
+
+    def _prepare(self, frame):
+        gray = None
+        if self.localizer is not None:
+            gray = self.localizer.crop(frame)  # already grayscale
+            if gray is None and not self.fallback_to_roi:
+                return None
+
+        if gray is None:
+            # Predefined ROI Based on Original Image
+            if self.roi is not None:
+                x, y, width, height = self.roi
+                frame = frame[y:y + height, x:x + width]
+            gray = frame  # the preprocessor converts to grayscale into its own buffer
+
+        image = self.preprocess(gray)
+        if self.preview is not None:
+            self.preview.put(image.copy())  # Show the preprocessed ROI (a copy, the buffer gets reused)
+        return image
+
+
+class EasyOcrRecognizer(RegionRecognizer):
+    """EasyOCR backend. Supports batched inference through reader.readtext_batched."""
+
+    name = 'easyocr'
+
+    def __init__(self, reader, allowlist=DIGITS, **options):
+        super().__init__(**options)
+        self.reader = reader  # easyocr.Reader or a LazyReader
+        self.allowlist = allowlist  # characters the recognizer may output (None for any)
+
+    @property
+    def failed(self):
+        return getattr(self.reader, 'error', None) is not None
+
+    def start(self):
+        if hasattr(self.reader, 'start_loading'):
+            self.reader.start_loading()
+
+    def _numbers(self, results):
+        return self.decoder.decode([(text, prob) for (bbox, text, prob) in results])
+
+    def recognize(self, frame):
+        try:
+            image = self.prepare(frame)
+            if image is None:
+                return []
+            return self._numbers(self.reader.readtext(image, allowlist=self.allowlist))
+        except Exception as e:
+            logging.error(f"Error during digit recognition with EasyOCR: {e}")
+            return []
+
+    def recognize_batch(self, frames):
+        try:
+            images = [self.prepare(frame, copy=True) for frame in frames]
+            rois = [image for image in images if image is not None]
+            if not rois:
+                return [[] for _ in frames]
+
+            # EasyOCR batches same-size images together, so resize when card crops and ROIs are mixed
+            shapes = {roi.shape[:2] for roi in rois}
+            n_width, n_height = (None, None)
+            if len(shapes) > 1:
+                n_height = max(height for height, _ in shapes)
+                n_width = max(width for _, width in shapes)
+            batch_results = iter(self.reader.readtext_batched(rois, n_width=n_width, n_height=n_height,
+                                                              batch_size=len(rois), allowlist=self.allowlist))
+            return [self._numbers(next(batch_results)) if image is not None else [] for image in images]
+        except Exception as e:
+            logging.error(f"Error during batched digit recognition with EasyOCR: {e}")
+            return [[] for _ in frames]
+
+
+class TesseractRecognizer(RegionRecognizer):
+    """Tesseract backend (needs the tesseract binary and pytesseract)."""
+
+    name = 'tesseract'
+
+    def __init__(self, config='-l eng --oem 1 --psm 7 -c tessedit_char_whitelist=0123456789',
+                 tesseract_cmd=None, **options):
+        options.setdefault('preprocess', 'threshold')
+        super().__init__(**options)
+        import pytesseract  # only needed when this backend is picked
+
+        self.pytesseract = pytesseract
+        if tesseract_cmd is not None:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self.config = config
+
+    def recognize(self, frame):
+        try:
+            image = self.prepare(frame)
+            if image is None:
+                return []
+            data = self.pytesseract.image_to_data(image, config=self.config,
+                                                  output_type=self.pytesseract.Output.DICT)
+            # One entry per word; conf is 0-100, or -1 for layout rows without text
+            words = [(text, float(conf) / 100) for text, conf in zip(data['text'], data['conf'])
+                     if text.strip() and float(conf) >= 0]
+            logging.info(f"Raw OCR Text: '{' '.join(text for text, _ in words)}'")
+            return self.decoder.decode(words)
+        except Exception as e:
+            logging.error(f"OCR Error: {e}")
+            return []
+
+
+class QrRecognizer(Recognizer):
+    """QR code only backend."""
+
+    name = 'qr'
+
+    def __init__(self, number_length=3, preview=None):
+        super().__init__(number_length, preview)
+        self.decoder = QrDecoder(number_length)
+
+    def recognize(self, frame):
+        return self.decoder.decode(frame)
+
+
+RECOGNIZERS = {
+    EasyOcrRecognizer.name: EasyOcrRecognizer,
+    TesseractRecognizer.name: TesseractRecognizer,
+    QrRecognizer.name: QrRecognizer,
+}
+
+
+def create_recognizer(name, **options):
+    """Builds the backend registered under name with the given options."""
+    try:
+        recognizer_class = RECOGNIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown recognizer backend '{name}', choose from {sorted(RECOGNIZERS)}")
+    return recognizer_class(**options)
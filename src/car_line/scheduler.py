@@ -0,0 +1,71 @@
+"""
+Adaptive frame scheduling.
+
+Replaces the fixed sleeps and FRAME_INTERVAL counting with a rate picked from what the lane is
+doing:
+
+    idle    - nothing has moved for a while: check a frame every idle_interval seconds
+    active  - motion or a card was seen in the last active_hold seconds: check every active_interval
+    busy    - the OCR queue is full: check every busy_interval, since OCR can't take more frames anyway
+
+The capture thread always keeps the newest frame, so whenever a check is due it runs on a fresh
+frame rather than one that sat in the camera buffer.
+"""
+
+import threading
+
+
+class FrameScheduler:
+    """Decides which frames get a motion check, based on recent motion and OCR backlog."""
+
+    def __init__(self, idle_interval=0.5, active_interval=0.0, busy_interval=0.25, active_hold=3.0):
+        self.idle_interval = idle_interval
+        self.active_interval = active_interval
+        self.busy_interval = busy_interval
+        self.active_hold = active_hold
+
+        self._lock = threading.Lock()
+        self._last_check = None
+        self._active_until = 0.0
+
+    def state(self, now, ocr_busy=False):
+        """Returns 'busy', 'active' or 'idle'."""
+        if ocr_busy:
+            return 'busy'
+        with self._lock:
+            return 'active' if now < self._active_until else 'idle'
+
+    def interval(self, now, ocr_busy=False):
+        """Seconds between motion checks in the current state."""
+        state = self.state(now, ocr_busy)
+        if state == 'busy':
+            return self.busy_interval
+        if state == 'active':
+            return self.active_interval
+        return self.idle_interval
+
+    def due(self, now, ocr_busy=False):
+        """Returns True if a frame captured at `now` should be checked for motion."""
+        interval = self.interval(now, ocr_busy)
+        with self._lock:
+            return self._last_check is None or now - self._last_check >= interval
+
+    def wait_time(self, now, ocr_busy=False):
+        """Seconds until the next check is due (0 if it is due now)."""
+        interval = self.interval(now, ocr_busy)
+        with self._lock:
+            if self._last_check is None:
+                return 0.0
+            return max(0.0, self._last_check + interval - now)
+
+    def record_check(self, now, motion):
+        """Records a motion check. Motion switches to (or extends) the active rate."""
+        with self._lock:
+            self._last_check = now
+            if motion:
+                self._active_until = max(self._active_until, now + self.active_hold)
+
+    def mark_active(self, now):
+        """Keeps the active rate while a card is being read, even if it is held still."""
+        with self._lock:
+            self._active_until = max(self._active_until, now + self.active_hold)
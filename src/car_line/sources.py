@@ -0,0 +1,216 @@
+"""
+Frame sources: live cameras, video files, image directories and recorded sessions.
+
+Everything here behaves like cv2.VideoCapture (read(), isOpened(), set(), release()), so the
+pipeline can run on a recording exactly as it runs on a camera. open_source() picks the source
+from what it is given:
+
+    0, "1", "rtsp://..."       a live camera or stream (a plain cv2.VideoCapture, or a
+                               car_line.capture.Camera when camera_settings are given)
+    "afternoon.mp4"            a video file
+    "cards/"                   a directory of images, played at a fixed frame rate
+    "session/"                 a recorded session: a directory with frames.csv (timestamp,filename)
+
+Replayed sources either keep the original timing (realtime=True, what a live lane would have
+seen) or deliver frames as fast as they can be read (realtime=False, for benchmarks). Either way
+`timestamp` holds the recorded time of the last frame, in seconds from the start of the recording.
+
+SessionRecorder / RecordingSource write a live camera to a session directory as it runs, so a bad
+afternoon can be replayed later.
+"""
+
+import csv
+import logging
+import os
+import time
+
+import cv2
+
+from car_line.capture import Camera
+
+FRAMES_FILE = 'frames.csv'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class ReplaySource:
+    """Base for recorded sources. Subclasses implement _next() -> (timestamp, frame) or None."""
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.timestamp = None
+        self._opened = True
+        self._start_wall = None
+        self._start_timestamp = None
+
+    def read(self):
+        item = self._next() if self._opened else None
+        if item is None:
+            return False, None
+        timestamp, frame = item
+        if self.realtime:
+            # Sleep until this frame is due, relative to when playback started
+            now = time.monotonic()
+            if self._start_wall is None:
+                self._start_wall, self._start_timestamp = now, timestamp
+            delay = (timestamp - self._start_timestamp) - (now - self._start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        self.timestamp = timestamp
+        return True, frame
+
+    def _next(self):
+        raise NotImplementedError
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        return False  # camera properties don't apply to recordings
+
+    def release(self):
+        self._opened = False
+
+
+class VideoFileSource(ReplaySource):
+    """A video file, timed by its own frame timestamps."""
+
+    def __init__(self, path, realtime=True):
+        super().__init__(realtime)
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._index = 0
+        self._opened = self.cap.isOpened()
+
+    def _next(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if timestamp <= 0 and self._index > 0:
+            timestamp = self._index / self.fps  # some containers don't report positions
+        self._index += 1
+        return timestamp, frame
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class ImageDirectorySource(ReplaySource):
+    """The images in a directory, in name order, played at a fixed frame rate."""
+
+    def __init__(self, directory, fps=10.0, realtime=True):
+        super().__init__(realtime)
+        self.fps = fps
+        self.paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                      if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self._index = 0
+
+    def _next(self):
+        while self._index < len(self.paths):
+            path = self.paths[self._index]
+            timestamp = self._index / self.fps
+            self._index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return timestamp, frame
+            logging.warning(f"Could not read {path}, skipping")
+        return None
+
+
+class SessionSource(ReplaySource):
+    """A session recorded by SessionRecorder, replayed with its original timestamps."""
+
+    def __init__(self, directory, realtime=True):
+        super().__init__(realtime)
+        self.directory = directory
+        with open(os.path.join(directory, FRAMES_FILE), newline='') as f:
+            self.frames = [(float(row['timestamp']), row['filename']) for row in csv.DictReader(f)]
+        self._index = 0
+
+    def _next(self):
+        while self._index < len(self.frames):
+            timestamp, filename = self.frames[self._index]
+            self._index += 1
+            frame = cv2.imread(os.path.join(self.directory, filename))
+            if frame is not None:
+                return timestamp, frame
+            logging.warning(f"Could not read {filename} from the session, skipping")
+        return None
+
+
+class SessionRecorder:
+    """Writes frames to a session directory as JPEGs plus a frames.csv of their timestamps."""
+
+    def __init__(self, directory, quality=95):
+        self.directory = directory
+        self.quality = quality
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(os.path.join(directory, FRAMES_FILE), 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['timestamp', 'filename'])
+        self._index = 0
+        self._start = None
+
+    def write(self, frame, timestamp=None):
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self._start is None:
+            self._start = timestamp
+        filename = f"{self._index:06d}.jpg"
+        cv2.imwrite(os.path.join(self.directory, filename), frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        self._writer.writerow([f"{timestamp - self._start:.4f}", filename])
+        self._index += 1
+
+    def close(self):
+        self._file.close()
+        logging.info(f"Recorded {self._index} frames to {self.directory}")
+
+
+class RecordingSource:
+    """Wraps a capture and records every frame it delivers."""
+
+    def __init__(self, cap, recorder):
+        self.cap = cap
+        self.recorder = recorder
+        self.buffers = getattr(cap, 'buffers', None)  # car_line.capture.Camera's frame buffers, if any
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.recorder.write(frame)
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+        self.recorder.close()
+
+
+def open_source(spec, realtime=True, record_dir=None, camera_settings=None):
+    """
+    Opens a camera index / stream URL, video file, image directory or session directory (see above).
+    camera_settings are Camera options (fourcc, width, height, ...) for a live camera.
+    """
+    if isinstance(spec, str) and spec.isdigit():
+        spec = int(spec)
+
+    if isinstance(spec, str) and os.path.isdir(spec):
+        if os.path.exists(os.path.join(spec, FRAMES_FILE)):
+            source = SessionSource(spec, realtime)
+        else:
+            source = ImageDirectorySource(spec, realtime=realtime)
+    elif isinstance(spec, str) and os.path.isfile(spec):
+        source = VideoFileSource(spec, realtime)
+    elif camera_settings:
+        source = Camera(spec, **camera_settings)
+    else:
+        source = cv2.VideoCapture(spec)
+
+    if record_dir is not None:
+        source = RecordingSource(source, SessionRecorder(record_dir))
+    return source
@@ -0,0 +1,189 @@
+"""
+Track-then-recognize: OCR once per card (or car), not once per motion event.
+
+Without tracking every motion check that sees movement sends its frame to OCR, so a car that
+takes ten seconds to pull up costs dozens of OCR passes, most of them on motion-blurred frames.
+CardTracker follows the moving regions MotionDetector finds from one check to the next (greedy
+IoU matching, each region gets a track id) and remembers the sharpest frame seen for each
+track, scored by the variance of the Laplacian over the region: high for a crisp, high-contrast
+card, low for a blurred or washed out one.
+
+Only that best frame goes to OCR: once the track has been seen for settle_checks checks, then
+(at most max_ocr_per_track times in all, and only while the track has no posted number) the
+sharpest new frame when it is clearly sharper than the last one read, or as soon as there is
+one if the last read still needs the debouncer's second vote, and finally when the track ends
+if a frame worth reading is left. OCR calls then grow with the number of cars instead of the
+number of frames.
+"""
+
+import logging
+import threading
+from itertools import count
+
+import cv2
+
+from car_line.metrics import metrics
+
+
+def sharpness(frame, box, width=160):
+    """Variance of the Laplacian over the box, on a grayscale crop shrunk to at most width pixels across."""
+    x, y, w, h = box
+    crop = frame[max(0, y):y + h, max(0, x):x + w]
+    if crop.size == 0:
+        return 0.0
+    if crop.shape[1] > width:
+        crop = cv2.resize(crop, (width, max(1, round(crop.shape[0] * width / crop.shape[1]))),
+                          interpolation=cv2.INTER_AREA)
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    _, stddev = cv2.meanStdDev(cv2.Laplacian(crop, cv2.CV_16S))
+    return float(stddev[0][0]) ** 2
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, width, height) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    intersection = w * h
+    return intersection / (aw * ah + bw * bh - intersection)
+
+
+class Track:
+    """One moving region followed across motion checks, with its best frame and OCR result."""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.hits = 0  # checks the region was matched in
+        self.missed = 0  # consecutive checks without a match
+        self.best_score = -1.0  # sharpest frame seen so far
+        # Sharpest frame seen since the last one was sent to OCR
+        self.candidate_score = -1.0
+        self.candidate_timestamp = None
+        self.candidate_frame = None
+        self.submitted_score = None  # score of the last frame sent to OCR
+        self.ocr_count = 0
+        self.numbers = []  # every number OCR read for this track
+        self.unconfirmed = False  # the last read found numbers the debouncer hasn't posted yet
+        self.done = False  # a number was posted (or already had been), no more OCR needed
+
+
+class CardTracker:
+    """Associates motion regions into tracks and decides which frames are worth an OCR pass."""
+
+    def __init__(self, regions, iou_threshold=0.3, max_missed=3, settle_checks=2, max_ocr_per_track=3,
+                 improvement=1.5, lane_id=None):
+        self.regions = regions  # regions() -> boxes of the last motion check, e.g. MotionDetector.regions
+        self.iou_threshold = iou_threshold  # overlap needed to continue a track
+        self.max_missed = max_missed  # checks a track may go unseen before it ends
+        self.settle_checks = settle_checks  # checks to collect frames before the first OCR pass
+        self.max_ocr_per_track = max_ocr_per_track
+        self.improvement = improvement  # how much sharper a frame must be to be read again
+        self.lane_id = lane_id
+
+        self.tracks = {}  # track id -> Track, live tracks only
+        self._ids = count(1)
+        self.started = 0  # tracks created so far
+        self._lock = threading.Lock()  # results come back on the OCR threads
+
+    def update(self, timestamp, frame, motion, usable=True, recycled=None):
+        """
+        Feeds one motion check. Returns [(track_id, timestamp, frame)] to send to OCR, where
+        timestamp is when the chosen (sharpest) frame was captured. usable=False (e.g. from a
+        QualityGate) keeps the tracks going but never picks this frame for OCR. recycled() -> True
+        means the camera reused the frame's buffer while it was being copied (car_line.capture),
+        and the copy is thrown away.
+        """
+        boxes = self.regions() if motion else []
+        with self._lock:
+            return self._update(timestamp, frame if usable else None, boxes, recycled)
+
+    def _update(self, timestamp, frame, boxes, recycled=None):
+        to_read = []
+
+        # Greedy matching: the best-overlapping (track, box) pairs first
+        pairs = sorted(((iou(track.box, box), track_id, i) for track_id, track in self.tracks.items()
+                        for i, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, track_id, i in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if track_id in matched_tracks or i in matched_boxes:
+                continue
+            matched_tracks.add(track_id)
+            matched_boxes.add(i)
+            self._observe(self.tracks[track_id], boxes[i], timestamp, frame, recycled)
+
+        for i, box in enumerate(boxes):
+            if i not in matched_boxes:
+                track = Track(next(self._ids), box)
+                self.tracks[track.id] = track
+                self.started += 1
+                metrics.inc('tracks', lane=self.lane_id)
+                self._observe(track, box, timestamp, frame, recycled)
+
+        for track_id, track in list(self.tracks.items()):
+            if track_id in matched_tracks:
+                continue
+            track.missed += 1
+            if track.missed > self.max_missed:
+                del self.tracks[track_id]
+                if self._wants_ocr(track):
+                    to_read.append(self._submit(track))
+                self._log_end(track)
+
+        for track in self.tracks.values():
+            if track.hits >= self.settle_checks and self._wants_ocr(track):
+                to_read.append(self._submit(track))
+        return to_read
+
+    def record_result(self, track_id, numbers, done):
+        """Reports what OCR read on a track's frame. done=True stops further OCR for the track."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                return
+            track.numbers.extend(number for number in numbers if number not in track.numbers)
+            track.done = track.done or done
+            track.unconfirmed = bool(numbers) and not track.done
+
+    def _observe(self, track, box, timestamp, frame, recycled=None):
+        track.box = box
+        track.hits += 1
+        track.missed = 0
+        if frame is None:
+            return
+        score = sharpness(frame, box)
+        if score > track.candidate_score:
+            copy = frame.copy()  # the camera may reuse the frame's buffer (car_line.capture)
+            if recycled is not None and recycled():
+                return
+            track.candidate_score = score
+            track.candidate_timestamp = timestamp
+            track.candidate_frame = copy
+        track.best_score = max(track.best_score, score)
+
+    def _wants_ocr(self, track):
+        if track.done or track.ocr_count >= self.max_ocr_per_track or track.candidate_frame is None:
+            return False
+        return (track.submitted_score is None or track.unconfirmed
+                or track.candidate_score > track.submitted_score * self.improvement)
+
+    def _submit(self, track):
+        item = track.id, track.candidate_timestamp, track.candidate_frame
+        track.submitted_score = track.candidate_score
+        track.candidate_score = -1.0
+        track.candidate_timestamp = track.candidate_frame = None
+        track.unconfirmed = False  # wait for this read's result before asking for another
+        track.ocr_count += 1
+        metrics.inc('track_ocr', lane=self.lane_id)
+        return item
+
+    def _log_end(self, track):
+        numbers = ", ".join(track.numbers) or "nothing"
+        logging.info(f"Track {track.id} ended after {track.hits} checks, {track.ocr_count} OCR pass(es), "
+                     f"read {numbers}")
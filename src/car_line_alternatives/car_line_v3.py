@@ -1,9 +1,17 @@
-import cv2
-import easyocr
-import requests
-import time
+"""
+EasyOCR on the whole frame, with adaptive threshold + morphology preprocessing.
+"""
+
 import logging
-import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # so car_line can be imported from src/
+from car_line.app import run_car_line
+from car_line.dispatcher import ApiDispatcher
+from car_line.ocr_reader import LazyReader
+from car_line.pipeline import LatestFrame
+from car_line.recognizers import EasyOcrRecognizer
 
 """THIS WAS THE BEST SO FAR, ACTUALLY USABLE! """
 
@@ -12,16 +20,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # Configuration (Adjust these!)
 API_ENDPOINT = "http://localhost:8080"
-MOTION_THRESHOLD = 20
-FRAME_INTERVAL = 5
-
-# Initialize EasyOCR reader
-try:
-    reader = easyocr.Reader(['en'])  # Specify language (English in this case)
-    logging.info("EasyOCR reader initialized successfully.")
-except Exception as e:
-    logging.error(f"Error initializing EasyOCR reader: {e}")
-    exit()  # Exit if EasyOCR initialization fails
+NUMBER_LENGTH = 3
 
 # New CONFIG Settings for Digits - Tune based on your image
 ROI_X_START = 0  # Approximate x-coordinate of the top-left corner of digits
@@ -30,148 +29,13 @@ ROI_WIDTH = 640  # Approximate width of the digit region
 ROI_HEIGHT = 480  # Approximate height of the digit region
 
 
-def detect_motion(frame1, frame2):
-    """Detects motion between two frames."""
-    try:
-        # Calculate the difference between the frames
-        diff = cv2.absdiff(frame1, frame2)
-        gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, thresh = cv2.threshold(blur, MOTION_THRESHOLD, 255, cv2.THRESH_BINARY)
-        dilated = cv2.dilate(thresh, None, iterations=3)
-        contours, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-
-        # If enough motion is detected, return True
-        if len(contours) > 0:
-            return True
-        else:
-            return False
-    except Exception as e:
-        logging.error(f"Error during motion detection: {e}")
-        return False
-
-def recognize_digits_with_easyocr(frame):
-    """Recognizes digits in a frame using EasyOCR."""
-    try:
-        # Predefined ROI Based on Original Image
-        roi = frame[ROI_Y_START:ROI_Y_START + ROI_HEIGHT, ROI_X_START:ROI_X_START + ROI_WIDTH]
-
-        # Convert ROI to grayscale (EasyOCR works best with grayscale)
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-
-        # Apply Adaptive Thresholding to preprocess the images
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
-
-        #Morph Functions
-        kernel = np.ones((3, 3), np.uint8)
-        opening = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)  # Remove small noises
-        closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=1)  # Close potential gaps
-        thresh = closing
-        #Show it
-        cv2.imshow("EasyOCR Input", thresh)  # Show the preprocessed ROI
-        cv2.waitKey(1)
-
-
-        # Perform OCR using EasyOCR
-        results = reader.readtext(thresh)
-
-        #Extract the text
-        recognized_digits = [] #Store digits
-        for (bbox, text, prob) in results:
-            text = ''.join(filter(str.isdigit, text)).strip() #Extrat Numbers
-
-            #Now Verify only numbers and correct digit amount
-            if len(text) == 3 and text.isdigit():
-                recognized_digits.append(text) #Append Digits
-
-
-        return recognized_digits
-
-    except Exception as e:
-        logging.error(f"Error during digit recognition with EasyOCR: {e}")
-        return []
-
 def main():
     """Main function to capture video and use EasyOCR for digit recognition."""
-    try:
-        cap = cv2.VideoCapture(0)
-
-        if not cap.isOpened():
-            logging.error("Error: Could not open webcam")
-            return
-
-        # Read the first frame
-        ret, frame1 = cap.read()
-        if not ret:
-            logging.error("Error: Could not read initial frame")
-            return
-        # Get camera resolution
-
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        print(f"Camera resolution: {width}x{height}")
-        logging.info(f"Camera resolution: {width}x{height}")
-
-        frame_count = 0
-        while True:
-            # Read the next frame
-            ret, frame2 = cap.read()
-            if not ret:
-                logging.error("Error: Could not read frame")
-                break
-
-            cv2.imshow("Original Frame", frame2) #Show orig frame
-            # Small delay here to reduce the frame rate the camera looks for motion
-            time.sleep(0.1)  # Short break before the next frame
-
-            # Detect motion
-            if frame_count % FRAME_INTERVAL == 0:
-                if detect_motion(frame1, frame2):
-                    print("Motion Detected!")
-                    logging.info("Motion detected!")
-                     # Draw the ROI on the frame2 before calling recognize_digits
-                    cv2.rectangle(frame2, (ROI_X_START, ROI_Y_START), (ROI_X_START + ROI_WIDTH, ROI_Y_START + ROI_HEIGHT), (0, 255, 0), 2)
-                    cv2.imshow("Frame with ROI", frame2) # ADDED THIS LINE
-                    cv2.waitKey(1)
-
-
-                    # Recognize digits in captured frame
-                    numbers = recognize_digits_with_easyocr(frame2)
-                    if numbers:
-                        print(f"Numbers: {numbers}")
-                        for number in numbers: #loop to post
-                           try:
-                               api_data = {'student_number': number}
-                               response = requests.post(API_ENDPOINT, json=api_data)
-
-                               if response.status_code == 200:
-                                   student_name = response.json().get('student_name', 'Unknown')
-                                   logging.info(f"Student Number: {number}, Student Name: {student_name}")
-                               else:
-                                   logging.error(f"API Error: {response.status_code}, {response.text}")
-                           except requests.exceptions.RequestException as e:
-                                 logging.error(f"API Request Exception: {e}")
-
-
-                    # Wait 2 seconds before scanning again
-                    time.sleep(2)
-
-                # Update frame1 for the next iteration
-                frame1 = frame2.copy()
-            frame_count += 1
-
-
-            # Break the loop if 'q' is pressed
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-    except Exception as e:
-        logging.error(f"Error in main function: {e}")
+    preview = LatestFrame()
+    recognizer = EasyOcrRecognizer(LazyReader(['en']), roi=(ROI_X_START, ROI_Y_START, ROI_WIDTH, ROI_HEIGHT),
+                                   preprocess='threshold', number_length=NUMBER_LENGTH, preview=preview)
+    run_car_line(recognizer, ApiDispatcher(API_ENDPOINT), preview=preview)
 
-    finally:
-        # Release the camera and destroy all windows
-        cap.release()
-        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,25 +1,103 @@
-import cv2
-import easyocr
-import requests
-import time
+import argparse
 import logging
-import numpy as np
+from car_line.app import run_lanes
+from car_line.capture import MIN_BUFFERS
+from car_line.config import ConfigError, ConfigWatcher, Setting, check_lanes, load_config
+from car_line.debounce import NumberDebouncer
+from car_line.decoding import DigitDecoder, load_numbers
+from car_line.dispatcher import ApiDispatcher
+from car_line.localizer import CardLocalizer
+from car_line.motion import MotionDetector
+from car_line.ocr_processes import ProcessPoolRecognizer
+from car_line.ocr_reader import LazyReader
+from car_line.pipeline import LatestFrame
+from car_line.preprocess import Preprocessor
+from car_line.qr import QrDecoder
+from car_line.quality import QualityGate
+from car_line.recognizers import RECOGNIZERS, RegionRecognizer, create_recognizer
+from car_line.scheduler import FrameScheduler
+from car_line.tracker import CardTracker
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Configuration (Adjust these!)
+# Configuration (Adjust these, or override them per lane box with a config file: --config lane.toml)
+# One entry per camera. camera is a device index, an RTSP URL or a video file. With more than one lane,
+# give each an id (e.g. 'north', 'south'); it is sent with every number so the server knows which lane read it.
+LANES = [
+    {'id': None, 'camera': 0},
+]
+OCR_WORKERS = 1  # OCR threads shared by all lanes; the model is loaded once however many cameras there are
+OCR_PROCESSES = 0  # Above 0, OCR runs in this many worker processes (one model each) to use more CPU cores
+HEADLESS = False  # No preview windows (for lane boxes without a monitor); stop with Ctrl+C or SIGTERM
+DEBUG_STREAM_PORT = None  # e.g. 8090 to watch the cameras at http://<lane box>:8090/ as a low-rate MJPEG stream
+DEBUG_STREAM_FPS = 2.0
+METRICS_PORT = None  # e.g. 9108 to expose per-stage timings and counters at http://<lane box>:9108/metrics
+METRICS_LOG_INTERVAL = 60.0  # Seconds between JSON metrics log lines (None to turn them off)
 API_ENDPOINT = "http://localhost:8080"
+API_TIMEOUT = (2.0, 5.0)  # (connect, read) seconds per post
+API_MAX_RETRIES = 3
+API_BATCH_SIZE = 1  # Set above 1 if the server accepts {"student_numbers": [...]}
+API_SPOOL_MAX_AGE = 3600.0  # Seconds an unsent number is still worth posting once the server is back (None: always)
 MOTION_THRESHOLD = 20
-FRAME_INTERVAL = 5
-
-# Initialize EasyOCR reader
-try:
-    reader = easyocr.Reader(['en'])  # Specify language (English in this case)
-    logging.info("EasyOCR reader initialized successfully.")
-except Exception as e:
-    logging.error(f"Error initializing EasyOCR reader: {e}")
-    exit()  # Exit if EasyOCR initialization fails
+MOTION_METHOD = 'running_average'  # or 'mog2'
+MOTION_MIN_AREA = 0.01  # Fraction of the picture that has to change before OCR runs
+MOTION_WIDTH = 160  # Motion is checked on a grayscale thumbnail this many pixels wide
+MOTION_LEARNING_RATE = 0.05  # How quickly the background model absorbs changes
+IDLE_CHECK_INTERVAL = 0.5  # Seconds between motion checks while the lane is empty
+ACTIVE_CHECK_INTERVAL = 0.0  # Seconds between checks while a car or card is in view (0 = every frame)
+BUSY_CHECK_INTERVAL = 0.25  # Seconds between checks while the OCR queue is full
+ACTIVE_HOLD = 3.0  # Seconds to stay at the active rate after the last motion or read
+CONFIRM_FRAMES = 2  # A number must be read in this many OCR passes before it is posted
+VOTE_WINDOW = 3.0  # Seconds those passes may be spread over
+REPOST_TTL = 300.0  # Seconds a posted number is ignored while the same car is still in line
+TRACK_CARDS = True  # Follow each card / car across frames and OCR only its sharpest frames
+TRACK_MAX_OCR = 3  # OCR passes allowed per track (the debouncer needs CONFIRM_FRAMES of them to agree)
+TRACK_MAX_MISSED = 3  # Motion checks a track may go unseen before it counts as gone
+QUALITY_GATE = True  # Skip OCR on frames that are too blurred, dark or glaring to read
+MIN_SHARPNESS = 20.0  # Variance of the Laplacian on a 320 pixel wide grayscale copy; lower is blur
+MIN_BRIGHTNESS = 30  # Mean brightness (0-255); darker frames are skipped
+MAX_GLARE = 0.25  # Fraction of blown-out pixels above which a frame is skipped
+MAX_MOTION_FRACTION = 0.6  # More of the picture changing at once is shake, a lighting change or heavy rain
+OCR_BATCH_SIZE = 1  # Above 1, up to this many motion frames are read in one batched OCR call
+OCR_BATCH_MAX_WAIT = 0.25  # Seconds the first frame of a batch waits for more frames
+
+# Camera capture. None leaves a setting to OpenCV and the driver. A lane in LANES can override any
+# of these with its own 'capture' dict, e.g. {'id': 2, 'camera': 1, 'capture': {'width': 1280}}.
+CAMERA_API = None  # 'v4l2' on Linux (needed for CAMERA_GRAY to skip the BGR conversion), 'dshow' / 'msmf' on Windows
+CAMERA_FOURCC = None  # 'MJPG' for high resolutions / frame rates over USB 2, 'YUYV' for uncompressed frames
+CAMERA_WIDTH = None
+CAMERA_HEIGHT = None
+CAMERA_FPS = None
+CAMERA_BUFFER_SIZE = 1  # Frames queued in the driver; 1 keeps the lane current
+CAMERA_GRAY = False  # Capture only the luminance plane; everything downstream works in grayscale anyway
+CAMERA_FRAME_BUFFERS = None  # Opt in: read frames into this many (3 or more) preallocated arrays in turn
+
+# Recognizer backend: 'easyocr', 'tesseract' or 'qr' (override with --backend)
+RECOGNIZER_BACKEND = 'easyocr'
+NUMBER_LENGTH = 3
+TESSERACT_CONFIG = '-l eng --oem 1 --psm 7 -c tessedit_char_whitelist=0123456789'
+TESSERACT_CMD = None  # e.g. r'C:\Program Files\Tesseract-OCR\tesseract.exe' if it isn't on the PATH
+
+# OCR reads are snapped to the numbers in this roster (CSV with a 'number' column, e.g. "data/roster.csv",
+# or one number per line): a read one digit off from a single roster number is corrected, anything else
+# is dropped. Exact roster matches read with at least OCR_TRUST_CONFIDENCE are posted from the first
+# frame instead of waiting for CONFIRM_FRAMES. None keeps any NUMBER_LENGTH digit read, as before.
+ROSTER_FILE = None
+OCR_MIN_CONFIDENCE = 0.3  # OCR detections less confident than this (0-1) are ignored
+OCR_TRUST_CONFIDENCE = 0.9
+
+# Preprocessing before OCR: a preset from car_line.preprocess ('gray' = v4's plain grayscale,
+# 'threshold' = v2/v3's adaptive threshold + open/close, 'card' = v1's chain) or a list of steps,
+# e.g. ['clahe', ('dilate', 2)]. Only the listed steps run.
+EASYOCR_PREPROCESS = 'gray'
+TESSERACT_PREPROCESS = 'threshold'
+
+# EasyOCR model settings
+EASYOCR_MODEL_DIR = None  # Local model cache (e.g. "models/easyocr"); None uses EasyOCR's default ~/.EasyOCR
+EASYOCR_USER_NETWORK_DIR = None  # Directory holding a custom recognizer, e.g. a digits-only model
+EASYOCR_RECOG_NETWORK = 'standard'  # Name of the recognizer to load ('standard' or a custom one)
+EASYOCR_QUANTIZE = True  # Use int8-quantized weights on CPU
 
 # Camera size is 640x480
 
@@ -29,164 +107,304 @@ ROI_Y_START = 20  # Approximate y-coordinate of the top-left corner of digits
 ROI_WIDTH = 600  # Approximate width of the digit region
 ROI_HEIGHT = 440  # Approximate height of the digit region
 
+# QR codes on the card are decoded first; EasyOCR only runs on frames without a readable code
+READ_QR_CODES = True
 
-def detect_motion(frame1, frame2):
-    """Detects motion between two frames."""
-    try:
-        # Calculate the difference between the frames
-        diff = cv2.absdiff(frame1, frame2)
-        gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, thresh = cv2.threshold(blur, MOTION_THRESHOLD, 255, cv2.THRESH_BINARY)
-        dilated = cv2.dilate(thresh, None, iterations=3)
-        contours, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-
-        # If enough motion is detected, return True
-        if len(contours) > 0:
-            return True
-        else:
-            return False
-    except Exception as e:
-        logging.error(f"Error during motion detection: {e}")
-        return False
-
-
-def recognize_digits_with_easyocr(frame):
-    """Recognizes digits in a frame using EasyOCR."""
-    try:
-        # Predefined ROI Based on Original Image
-        roi = frame[ROI_Y_START:ROI_Y_START + ROI_HEIGHT, ROI_X_START:ROI_X_START + ROI_WIDTH]
-
-        # Convert ROI to grayscale (EasyOCR works best with grayscale)
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-
-        #Now test to see if this portion is working by removing Adaptive
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-
-        #Adaptive Threshold
-        #clahe_output = clahe.apply(median)
-        # cv2.imshow("Gray Test 1:10", gray)
-        # cv2.waitKey(1)
-
-        kernel = np.ones((2, 2), np.uint8)
-        dilated = cv2.dilate(gray, kernel)
-        #cv2.imshow("DilationBeforeMedian", dilated)
-        #cv2.waitKey(1)
-        #.Add what it needs but remove the non value add.
-
-        median = dilated
-        clahe_output = clahe.apply(median)
-        #-
-
-        clahe_output = gray
-        clahe = dilated #To pass this
+# Card localization: find the card and OCR only a flattened crop of it instead of the whole ROI
+LOCALIZE_CARD = True
+CARD_FALLBACK_TO_ROI = True  # If no card outline is found, OCR the ROI as before (False skips the frame)
 
-        #cv2.imshow("clahe_output", clahe_output)
-        #cv2.waitKey(1)
 
-        #Show it.
-        thresh = clahe_output
-        cv2.imshow("EasyOCR Input", thresh)  # Show the preprocessed ROI
-        #cv2.waitKey(1)
-        #Perform before image, because there is no roi image anymore
-        results = reader.readtext(thresh)
-
-        #Extract the text
-        recognized_digits = []  # Store digits
-        for (bbox, text, prob) in results:
-            text = ''.join(filter(str.isdigit, text)).strip()  # Extrat Numbers
-
-            # Now Verify only numbers and correct digit amount
-            if len(text) == 3 and text.isdigit():
-                recognized_digits.append(text)  # Append Digits
-
-        return recognized_digits
-
-    except Exception as e:
-        logging.error(f"Error during digit recognition with EasyOCR: {e}")
-        return []
-    
-
-def main():
-    """Main function to capture video and use EasyOCR for digit recognition."""
+def check_preprocess(steps):
     try:
-        
-        # cv2.namedWindow("AdaptiveThresh", cv2.WINDOW_NORMAL)
-        # cv2.moveWindow("Easy OCR Input", 500, 500)
-
-        cap = cv2.VideoCapture(0)
+        Preprocessor(steps)
+    except (KeyError, TypeError, ValueError) as e:
+        return f"not a valid preset or list of steps ({e})"
+    return None
+
+
+def check_pair(value):
+    return None if len(value) == 2 else "must be two numbers, (connect, read)"
+
+
+# The type, range and reload behavior of every setting above, used to check config files. hot
+# settings are pushed into the running lanes when the config file changes; the rest need a restart.
+SETTINGS = {
+    'LANES': Setting(list, validate=check_lanes),
+    'OCR_WORKERS': Setting(int, minimum=1),
+    'OCR_PROCESSES': Setting(int, minimum=0),
+    'HEADLESS': Setting(bool),
+    'DEBUG_STREAM_PORT': Setting(int, optional=True, minimum=1, maximum=65535),
+    'DEBUG_STREAM_FPS': Setting(float, minimum=0.1),
+    'METRICS_PORT': Setting(int, optional=True, minimum=1, maximum=65535),
+    'METRICS_LOG_INTERVAL': Setting(float, optional=True, minimum=1),
+    'API_ENDPOINT': Setting(str),
+    'API_TIMEOUT': Setting((float, tuple), hot=True,
+                           validate=lambda value: check_pair(value) if isinstance(value, tuple) else None),
+    'API_MAX_RETRIES': Setting(int, hot=True, minimum=0),
+    'API_BATCH_SIZE': Setting(int, minimum=1),
+    'API_SPOOL_MAX_AGE': Setting(float, hot=True, optional=True, minimum=0),
+    'MOTION_THRESHOLD': Setting(int, hot=True, minimum=0, maximum=255),
+    'MOTION_METHOD': Setting(str, choices=('running_average', 'mog2')),
+    'MOTION_MIN_AREA': Setting(float, hot=True, minimum=0, maximum=1),
+    'MOTION_WIDTH': Setting(int, minimum=16),
+    'MOTION_LEARNING_RATE': Setting(float, hot=True, minimum=0, maximum=1),
+    'IDLE_CHECK_INTERVAL': Setting(float, hot=True, minimum=0),
+    'ACTIVE_CHECK_INTERVAL': Setting(float, hot=True, minimum=0),
+    'BUSY_CHECK_INTERVAL': Setting(float, hot=True, minimum=0),
+    'ACTIVE_HOLD': Setting(float, hot=True, minimum=0),
+    'CONFIRM_FRAMES': Setting(int, hot=True, minimum=1),
+    'VOTE_WINDOW': Setting(float, hot=True, minimum=0),
+    'REPOST_TTL': Setting(float, hot=True, minimum=0),
+    'TRACK_CARDS': Setting(bool),
+    'TRACK_MAX_OCR': Setting(int, hot=True, minimum=1),
+    'TRACK_MAX_MISSED': Setting(int, hot=True, minimum=0),
+    'QUALITY_GATE': Setting(bool),
+    'MIN_SHARPNESS': Setting(float, hot=True, minimum=0),
+    'MIN_BRIGHTNESS': Setting(float, hot=True, minimum=0, maximum=255),
+    'MAX_GLARE': Setting(float, hot=True, minimum=0, maximum=1),
+    'MAX_MOTION_FRACTION': Setting(float, hot=True, minimum=0, maximum=1),
+    'OCR_BATCH_SIZE': Setting(int, minimum=1),
+    'OCR_BATCH_MAX_WAIT': Setting(float, minimum=0),
+    'CAMERA_API': Setting(str, optional=True, choices=('v4l2', 'dshow', 'msmf', 'gstreamer')),
+    'CAMERA_FOURCC': Setting(str, optional=True,
+                             validate=lambda value: None if len(value) == 4 else "must be 4 characters, e.g. 'MJPG'"),
+    'CAMERA_WIDTH': Setting(int, optional=True, minimum=1),
+    'CAMERA_HEIGHT': Setting(int, optional=True, minimum=1),
+    'CAMERA_FPS': Setting(float, optional=True, minimum=1),
+    'CAMERA_BUFFER_SIZE': Setting(int, optional=True, minimum=1),
+    'CAMERA_GRAY': Setting(bool),
+    'CAMERA_FRAME_BUFFERS': Setting(int, optional=True, minimum=MIN_BUFFERS),
+    'RECOGNIZER_BACKEND': Setting(str, choices=tuple(sorted(RECOGNIZERS))),
+    'NUMBER_LENGTH': Setting(int, minimum=1),
+    'TESSERACT_CONFIG': Setting(str),
+    'TESSERACT_CMD': Setting(str, optional=True),
+    'ROSTER_FILE': Setting(str, optional=True),
+    'OCR_MIN_CONFIDENCE': Setting(float, hot=True, minimum=0, maximum=1),
+    'OCR_TRUST_CONFIDENCE': Setting(float, hot=True, minimum=0, maximum=1),
+    'EASYOCR_PREPROCESS': Setting((str, list), validate=check_preprocess),
+    'TESSERACT_PREPROCESS': Setting((str, list), validate=check_preprocess),
+    'EASYOCR_MODEL_DIR': Setting(str, optional=True),
+    'EASYOCR_USER_NETWORK_DIR': Setting(str, optional=True),
+    'EASYOCR_RECOG_NETWORK': Setting(str),
+    'EASYOCR_QUANTIZE': Setting(bool),
+    'ROI_X_START': Setting(int, hot=True, minimum=0),
+    'ROI_Y_START': Setting(int, hot=True, minimum=0),
+    'ROI_WIDTH': Setting(int, hot=True, minimum=1),
+    'ROI_HEIGHT': Setting(int, hot=True, minimum=1),
+    'READ_QR_CODES': Setting(bool),
+    'LOCALIZE_CARD': Setting(bool),
+    'CARD_FALLBACK_TO_ROI': Setting(bool, hot=True),
+}
+CONFIG_FILE = None  # set by load_settings()
+
+# Settings of the recognizer itself; with OCR_PROCESSES it lives in the worker processes, out of reach
+RECOGNIZER_SETTINGS = {'OCR_MIN_CONFIDENCE', 'OCR_TRUST_CONFIDENCE', 'ROI_X_START', 'ROI_Y_START', 'ROI_WIDTH',
+                       'ROI_HEIGHT', 'CARD_FALLBACK_TO_ROI'}
+
+
+def build_reader():
+    # The EasyOCR reader loads on a background thread when main() starts, so the camera and motion
+    # detection don't wait for torch and the model weights. OCR calls wait until it is ready.
+    return LazyReader(['en'], model_dir=EASYOCR_MODEL_DIR, user_network_dir=EASYOCR_USER_NETWORK_DIR,
+                      recog_network=EASYOCR_RECOG_NETWORK, quantize=EASYOCR_QUANTIZE)
+
+
+reader = build_reader()
+qr_decoder = QrDecoder(number_length=NUMBER_LENGTH)
+card_localizer = CardLocalizer()
+
+# OCR runs on a worker thread, so the preprocessed ROI is handed back here and shown from the main thread
+ocr_preview = LatestFrame()
+
+# Stages built by the build_* functions below, so a reloaded config can be pushed into them
+running = []
+
+
+def load_settings(path):
+    """Overrides the settings above with a config file (raises ConfigError if it isn't valid). Returns its values."""
+    global CONFIG_FILE, reader, qr_decoder
+    values = load_config(path, SETTINGS)
+    globals().update(values)
+    CONFIG_FILE = path
+    # Rebuilt with the new settings; nothing has been started yet
+    reader = build_reader()
+    qr_decoder = QrDecoder(number_length=NUMBER_LENGTH)
+    logging.info(f"Loaded settings from {path}")
+    return values
+
+
+def apply_settings(values):
+    """Applies hot settings while the lanes run (ConfigWatcher's callback)."""
+    globals().update(values)
+    if OCR_PROCESSES and RECOGNIZER_SETTINGS & set(values):
+        logging.warning("OCR runs in worker processes; restart the lane to apply "
+                        f"{', '.join(sorted(name.lower() for name in RECOGNIZER_SETTINGS & set(values)))}")
+    retune()
+
+
+def retune():
+    """Pushes the current hot settings into every running stage. The recognizer's model is left alone."""
+    for stage in running:
+        if isinstance(stage, MotionDetector):
+            stage.threshold = MOTION_THRESHOLD
+            stage.min_area_fraction = MOTION_MIN_AREA
+            stage.learning_rate = MOTION_LEARNING_RATE
+        elif isinstance(stage, FrameScheduler):
+            stage.idle_interval = IDLE_CHECK_INTERVAL
+            stage.active_interval = ACTIVE_CHECK_INTERVAL
+            stage.busy_interval = BUSY_CHECK_INTERVAL
+            stage.active_hold = ACTIVE_HOLD
+        elif isinstance(stage, NumberDebouncer):
+            stage.confirm_frames = CONFIRM_FRAMES
+            stage.vote_window = VOTE_WINDOW
+            stage.repost_ttl = REPOST_TTL
+        elif isinstance(stage, CardTracker):
+            stage.max_missed = TRACK_MAX_MISSED
+            stage.max_ocr_per_track = TRACK_MAX_OCR
+        elif isinstance(stage, QualityGate):
+            stage.min_sharpness = MIN_SHARPNESS
+            stage.min_brightness = MIN_BRIGHTNESS
+            stage.max_clipped_fraction = MAX_GLARE
+            stage.max_motion_fraction = MAX_MOTION_FRACTION
+        elif isinstance(stage, RegionRecognizer):
+            stage.roi = (ROI_X_START, ROI_Y_START, ROI_WIDTH, ROI_HEIGHT)
+            stage.fallback_to_roi = CARD_FALLBACK_TO_ROI
+            stage.decoder.min_confidence = OCR_MIN_CONFIDENCE
+            stage.decoder.trust_confidence = OCR_TRUST_CONFIDENCE
+        elif isinstance(stage, ApiDispatcher):
+            stage.timeout = API_TIMEOUT
+            stage.max_retries = API_MAX_RETRIES
+            stage.max_spool_age = API_SPOOL_MAX_AGE
+
+
+def camera_settings():
+    """The CAMERA_* settings that change anything; empty (a plain cv2.VideoCapture) when none do."""
+    settings = {'api': CAMERA_API, 'fourcc': CAMERA_FOURCC, 'width': CAMERA_WIDTH, 'height': CAMERA_HEIGHT,
+                'fps': CAMERA_FPS, 'buffer_size': CAMERA_BUFFER_SIZE if CAMERA_BUFFER_SIZE != 1 else None,
+                'gray': CAMERA_GRAY or None, 'buffers': CAMERA_FRAME_BUFFERS}
+    return {name: value for name, value in settings.items() if value is not None}
+
+
+def started(stage):
+    running.append(stage)
+    return stage
+
+
+def build_quality_gate(motion_detector, lane_id=None):
+    return started(QualityGate(motion_detector, min_sharpness=MIN_SHARPNESS, min_brightness=MIN_BRIGHTNESS,
+                               max_clipped_fraction=MAX_GLARE, max_motion_fraction=MAX_MOTION_FRACTION,
+                               lane_id=lane_id))
+
+
+def build_decoder():
+    numbers = load_numbers(ROSTER_FILE) if ROSTER_FILE else None
+    return DigitDecoder(NUMBER_LENGTH, numbers, min_confidence=OCR_MIN_CONFIDENCE,
+                        trust_confidence=OCR_TRUST_CONFIDENCE)
+
+
+def build_recognizer(backend, processes=0, preprocess=None, config_file=None, preview=None):
+    """
+    Builds the recognizer backend configured above, in worker processes if processes > 0.
+    preprocess overrides the backend's configured preprocessing (e.g. to A/B test chains).
+    config_file is loaded first (worker processes start from the defaults above).
+    preview is a LatestFrame to copy every OCR input into; leave it None when nothing shows it.
+    """
+    if config_file is not None:
+        load_settings(config_file)
+    if processes > 0:
+        # Each worker process calls build_recognizer(backend) itself and loads its own model
+        return ProcessPoolRecognizer(build_recognizer, (backend, 0, preprocess, CONFIG_FILE), processes)
+
+    options = {'number_length': NUMBER_LENGTH, 'preview': preview}
+    if backend in ('easyocr', 'tesseract'):
+        options.update(roi=(ROI_X_START, ROI_Y_START, ROI_WIDTH, ROI_HEIGHT),
+                       localizer=card_localizer if LOCALIZE_CARD else None,
+                       fallback_to_roi=CARD_FALLBACK_TO_ROI, decoder=build_decoder())
+    if backend == 'easyocr':
+        options.update(reader=reader, preprocess=preprocess or EASYOCR_PREPROCESS)
+    elif backend == 'tesseract':
+        options.update(config=TESSERACT_CONFIG, tesseract_cmd=TESSERACT_CMD,
+                       preprocess=preprocess or TESSERACT_PREPROCESS)
+    return started(create_recognizer(backend, **options))
+
+
+def build_motion_detector():
+    return started(MotionDetector(MOTION_METHOD, threshold=MOTION_THRESHOLD, min_area_fraction=MOTION_MIN_AREA,
+                                  width=MOTION_WIDTH, learning_rate=MOTION_LEARNING_RATE))
+
+
+def build_scheduler():
+    return started(FrameScheduler(IDLE_CHECK_INTERVAL, ACTIVE_CHECK_INTERVAL, BUSY_CHECK_INTERVAL, ACTIVE_HOLD))
+
+
+def build_debouncer():
+    return started(NumberDebouncer(CONFIRM_FRAMES, VOTE_WINDOW, REPOST_TTL))
+
+
+def build_tracker(regions, lane_id=None):
+    return started(CardTracker(regions, max_missed=TRACK_MAX_MISSED, max_ocr_per_track=TRACK_MAX_OCR,
+                               lane_id=lane_id))
+
+
+def build_dispatcher():
+    return started(ApiDispatcher(API_ENDPOINT, timeout=API_TIMEOUT, max_retries=API_MAX_RETRIES,
+                                 batch_size=API_BATCH_SIZE, max_spool_age=API_SPOOL_MAX_AGE))
 
-        if not cap.isOpened():
-            logging.error("Error: Could not open webcam")
-            return
 
-        # Read the first frame
-        ret, frame1 = cap.read()
-        if not ret:
-            logging.error("Error: Could not read initial frame")
+def main():
+    """Main function to capture video from every lane and recognize pickup card numbers."""
+    parser = argparse.ArgumentParser(description="Read pickup card numbers from the camera and post them.")
+    parser.add_argument('--config', help="JSON or TOML file overriding the settings at the top of this script; "
+                                         "thresholds, ROI and sample rates are reloaded when it changes")
+    parser.add_argument('--backend', choices=sorted(RECOGNIZERS), help="recognizer backend to use")
+    parser.add_argument('--headless', action='store_true', default=None, help="run without preview windows")
+    parser.add_argument('--debug-stream', type=int, metavar='PORT',
+                        help="serve the camera feeds as MJPEG on this port")
+    parser.add_argument('--source', help="read this video file, image directory or recorded session "
+                                         "instead of the cameras in LANES")
+    parser.add_argument('--record', metavar='DIR', help="record the cameras to a session directory")
+    args = parser.parse_args()
+
+    watcher = None
+    if args.config:
+        try:
+            values = load_settings(args.config)
+        except ConfigError as e:
+            logging.error(f"Invalid config: {e}")
             return
-
-        # Get camera image size and print it
-
-        height, width, channels = frame1.shape #Added line. Note BGR
-        print(f"Initial Camera Image Size: Width = {width}, Height = {height}") #added line
-
-        frame_count = 0
-        while True:
-            # Read the next frame
-            ret, frame2 = cap.read()
-            if not ret:
-                logging.error("Error: Could not read frame")
-                break
-
-            cv2.imshow("Original Frame", frame2) #Show orig frame
-            # Small delay here to reduce the frame rate the camera looks for motion
-            time.sleep(1)  # Short break before the next frame
-
-            # Detect motion
-            if frame_count % FRAME_INTERVAL == 0:
-                if detect_motion(frame1, frame2):
-                    print("Motion Detected!")
-                    logging.info("Motion detected!")
-
-
-                    # Recognize digits in captured frame
-                    numbers = recognize_digits_with_easyocr(frame2)
-                    if numbers:
-                        print(f"Numbers: {numbers}")
-                        for number in numbers: #loop to post
-                           try:
-                               api_data = {'student_number': number}
-                               response = requests.post(API_ENDPOINT, json=api_data)
-
-                               if response.status_code == 200:
-                                   student_name = response.json().get('student_name', 'Unknown')
-                                   logging.info(f"Student Number: {number}, Student Name: {student_name}")
-                               else:
-                                   logging.error(f"API Error: {response.status_code}, {response.text}")
-                           except requests.exceptions.RequestException as e:
-                                 logging.error(f"API Request Exception: {e}")
-
-
-                    # Wait 2 seconds before scanning again
-                    #time.sleep(1)
-
-                # Update frame1 for the next iteration
-                frame1 = frame2.copy()
-            frame_count += 1
-
-
-            # Break the loop if 'q' is pressed
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-    except Exception as e:
-        logging.error(f"Error in main function: {e}")
-
+        watcher = ConfigWatcher(args.config, SETTINGS, values, apply_settings).start_watching()
+    # Command line flags win over the config file
+    backend = args.backend or RECOGNIZER_BACKEND
+    headless = HEADLESS if args.headless is None else args.headless
+    debug_stream_port = DEBUG_STREAM_PORT if args.debug_stream is None else args.debug_stream
+    lanes = [{'id': None, 'camera': args.source}] if args.source else LANES
+
+    # The OCR input is only worth copying out when a window or the debug stream shows it
+    preview = ocr_preview if not headless or debug_stream_port is not None else None
+    recognizer = build_recognizer(backend, OCR_PROCESSES, preview=preview)
+    # The QR fast path is pointless when QR is already the backend
+    fast_decode = qr_decoder.decode if READ_QR_CODES and backend != 'qr' else None
+
+    # Motion, scheduling and debouncing state is per camera, so each lane gets its own
+    try:
+        run_lanes(lanes, recognizer, build_dispatcher(),
+                  make_motion_detector=build_motion_detector,
+                  make_scheduler=build_scheduler,
+                  make_debouncer=build_debouncer,
+                  make_tracker=build_tracker if TRACK_CARDS else None,
+                  make_quality_gate=build_quality_gate if QUALITY_GATE else None,
+                  # one OCR thread per worker process keeps them all busy
+                  fast_decode=fast_decode, ocr_workers=max(OCR_WORKERS, OCR_PROCESSES),
+                  batch_size=OCR_BATCH_SIZE, batch_max_wait=OCR_BATCH_MAX_WAIT,
+                  preview=preview, headless=headless,
+                  debug_stream_port=debug_stream_port, debug_stream_fps=DEBUG_STREAM_FPS, record_dir=args.record,
+                  metrics_port=METRICS_PORT, metrics_log_interval=METRICS_LOG_INTERVAL,
+                  camera_settings=camera_settings())
     finally:
-        # Release the camera and destroy all windows
-        cap.release()
-        cv2.destroyAllWindows()
+        if watcher is not None:
+            watcher.stop()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,111 @@
+"""
+Load test for the test server.
+
+Starts the server in-process in both modes (single-threaded HTTPServer, and ThreadingHTTPServer
+with keep-alive), fires posts at it from several simulated lanes at once and prints
+requests/sec and latency percentiles for each:
+
+    python tests/load_test_server.py --lanes 8 --requests 200
+
+Use --url to load test a server that is already running instead.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import HTTPServer, ThreadingHTTPServer
+
+import requests
+
+from request_log_store import RequestLogStore
+from test_json_server import KeepAliveRequestHandler, RequestHandler, setup_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))  # for car_line
+from car_line.metrics import percentiles
+
+
+def lane(url, count, batch_size, latencies, errors):
+    """One simulated lane camera posting count requests over a single session."""
+    session = requests.Session()
+    for i in range(count):
+        if batch_size > 1:
+            payload = {'student_numbers': [str(100 + (i * batch_size + j) % 900) for j in range(batch_size)]}
+        else:
+            payload = {'student_number': str(100 + i % 900)}
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=payload, timeout=10)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except requests.exceptions.RequestException:
+            errors.append(i)
+    session.close()
+
+
+def load_test(url, lanes, count, batch_size):
+    latencies = []
+    errors = []
+    threads = [threading.Thread(target=lane, args=(url, count, batch_size, latencies, errors))
+               for _ in range(lanes)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latency = percentiles(latencies, (50, 99))
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': latency[50],
+        'p99': latency[99],
+    }
+
+
+def serve_in_background(server_class, handler_class, log_path):
+    httpd = setup_server(server_class(('127.0.0.1', 0), handler_class), request_log=RequestLogStore(log_path))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def print_result(name, result):
+    print(f"{name:<16} {result['requests']:>8} {result['errors']:>6} {result['rps']:>9.1f} "
+          f"{result['p50'] * 1000:>8.2f} {result['p99'] * 1000:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the pickup test server.")
+    parser.add_argument('--lanes', type=int, default=8, help="concurrent clients")
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    parser.add_argument('--batch-size', type=int, default=1, help="numbers per request (uses the batch format)")
+    parser.add_argument('--url', help="test this running server instead of starting one")
+    args = parser.parse_args()
+
+    print(f"{'server':<16} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    if args.url:
+        print_result(args.url, load_test(args.url, args.lanes, args.requests, args.batch_size))
+        return
+
+    modes = [
+        ('single-threaded', HTTPServer, RequestHandler),
+        ('threaded', ThreadingHTTPServer, KeepAliveRequestHandler),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, server_class, handler_class in modes:
+            httpd = serve_in_background(server_class, handler_class, os.path.join(tmp, f"{name}.jsonl"))
+            url = f"http://127.0.0.1:{httpd.server_address[1]}"
+            try:
+                print_result(name, load_test(url, args.lanes, args.requests, args.batch_size))
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+                httpd.roster.stop()
+                httpd.request_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Append-only request log for the test server.
+
+Every entry is one JSON object per line (JSON Lines), appended to an open file, so logging a
+post costs the same whether the log holds ten entries or a whole school year of them. Writes
+are flushed to the OS straight away and fsync'ed in batches (every fsync_every entries or
+fsync_interval seconds, whichever comes first). When the file passes max_bytes it is rotated
+to request_log.jsonl.1, .2, ... like logging.handlers.RotatingFileHandler.
+
+A crash can at worst leave a half-written last line; the reader skips it instead of
+throwing the whole log away.
+
+    python tests/request_log_store.py        # print every logged entry, oldest first
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_LOG_FILE = f"{os.path.dirname(__file__)}/../data/request_log.jsonl"
+
+
+class RequestLogStore:
+    """Thread-safe JSON Lines log with batched fsync and size-based rotation."""
+
+    def __init__(self, path=DEFAULT_LOG_FILE, max_bytes=10 * 1024 * 1024, backup_count=20, fsync_every=32,
+                 fsync_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="log-fsync", daemon=True)
+        self._flusher.start()
+
+    def append(self, entry):
+        """Appends one entry. O(1) regardless of how much is already logged."""
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()  # hand it to the OS now; fsync happens in batches
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        """Syncs anything pending and closes the file."""
+        self._stop_event.set()
+        self._flusher.join(timeout=2.0)
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def iter_entries(self):
+        """Streams every logged entry back, oldest first, without loading whole files into memory."""
+        with self._lock:
+            self._file.flush()
+        yield from iter_log(self.path, self.backup_count)
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _flush_periodically(self):
+        while not self._stop_event.wait(self.fsync_interval):
+            with self._lock:
+                if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync()
+
+
+def log_files(path=DEFAULT_LOG_FILE, backup_count=20):
+    """The current log file and its rotated backups that exist, oldest first."""
+    backups = [f"{path}.{i}" for i in range(backup_count, 0, -1)]
+    return [p for p in backups + [path] if os.path.exists(p)]
+
+
+def iter_log(path=DEFAULT_LOG_FILE, backup_count=20):
+    """Streams every entry of a log and its backups, oldest first."""
+    for log_file in log_files(path, backup_count):
+        yield from read_entries(log_file)
+
+
+def read_entries(path):
+    """Yields the entries of one JSON Lines log file, skipping torn or corrupt lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping unreadable line {line_number} in {path}")
+
+
+if __name__ == "__main__":
+    for entry in iter_log():
+        print(json.dumps(entry))
@@ -0,0 +1,181 @@
+"""
+Student roster and live pickup queue for the test server.
+
+Roster loads number -> students from a CSV file (columns: number, student_name, and anything else
+you want passed along, e.g. grade) or a SQLite database (a `students` table with the same
+columns) into an in-memory dict, so each post is a single hash lookup. Siblings share a pickup
+number and come back together. The file is watched and reloaded in the background when it
+changes; the new index is swapped in whole, so lookups never see a half-loaded roster.
+
+PickupQueue is the ordered list of cars waiting, one entry per pickup number, with O(1) enqueue
+and dequeue. Displays can poll snapshot(), wait_for_change() for the next update, or follow the
+event feed: every arrival and pickup is kept (the last max_events of them) with an increasing id,
+and events_since(cursor) hands back only what happened after the cursor.
+"""
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_ROSTER_FILE = f"{os.path.dirname(__file__)}/../data/roster.csv"
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+def load_roster(path):
+    """Reads a roster file into {number: [student, ...]}."""
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = [dict(row) for row in connection.execute("SELECT * FROM students")]
+        finally:
+            connection.close()
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+    index = {}
+    for row in rows:
+        number = str(row.get('number', '')).strip()
+        if not number:
+            continue
+        student = {key: value for key, value in row.items() if key != 'number'}
+        index.setdefault(number, []).append(student)
+    return index
+
+
+class Roster:
+    """number -> students index with hot reload."""
+
+    def __init__(self, path=DEFAULT_ROSTER_FILE, reload_interval=2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = {}
+        self._mtime = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.reload()
+
+    def lookup(self, number):
+        """Returns the students linked to a pickup number ([] if unknown)."""
+        return self._index.get(str(number), [])
+
+    def __len__(self):
+        return len(self._index)
+
+    def reload(self):
+        """Reloads the roster if the file changed since the last load. Returns True if it did."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is None:
+                logging.warning(f"No roster at {self.path}, every number will be 'Unknown'")
+                self._mtime = 0
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            index = load_roster(self.path)
+        except (OSError, csv.Error, sqlite3.Error) as e:
+            logging.error(f"Error loading roster {self.path}, keeping the previous one: {e}")
+            return False
+        self._index = index  # swapped in one assignment, so lookups never see a partial roster
+        self._mtime = mtime
+        logging.info(f"Loaded roster with {len(index)} pickup numbers from {self.path}")
+        return True
+
+    def start_watching(self):
+        """Checks the roster file for changes every reload_interval seconds."""
+        self._thread = threading.Thread(target=self._watch, name="roster-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _watch(self):
+        while not self._stop_event.wait(self.reload_interval):
+            self.reload()
+
+
+class PickupQueue:
+    """Ordered, de-duplicated queue of pickup numbers waiting to be called."""
+
+    def __init__(self, max_events=1000):
+        self._entries = OrderedDict()  # number -> entry, in arrival order
+        self._events = deque(maxlen=max_events)  # (id, event), oldest first
+        self._cond = threading.Condition()
+        self.version = 0  # bumped on every change, so displays can ask "anything newer than N?"
+
+    def enqueue(self, number, students, lane=None):
+        """Adds a car to the back of the queue. Returns False if it is already waiting."""
+        with self._cond:
+            if number in self._entries:
+                return False
+            entry = {
+                'student_number': number,
+                'students': students,
+                'lane': lane,
+                'arrived': time.time(),
+            }
+            self._entries[number] = entry
+            self._changed('arrived', entry)
+            return True
+
+    def dequeue(self, number=None):
+        """Removes a car (the front one if number is None). Returns its entry, or None."""
+        with self._cond:
+            if number is None:
+                if not self._entries:
+                    return None
+                _, entry = self._entries.popitem(last=False)
+            else:
+                entry = self._entries.pop(number, None)
+                if entry is None:
+                    return None
+            self._changed('picked_up', entry)
+            return entry
+
+    def snapshot(self):
+        """Returns (version, entries in arrival order)."""
+        with self._cond:
+            return self.version, list(self._entries.values())
+
+    def wait_for_change(self, since_version, timeout=None):
+        """Blocks until the queue changes after since_version (or timeout). Returns snapshot()."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since_version, timeout)
+            return self.version, list(self._entries.values())
+
+    def events_since(self, cursor, timeout=None):
+        """
+        Returns [(id, event), ...] for everything after cursor, waiting up to timeout for the first one.
+
+        A cursor of None (a new display), one older than the events still kept (a display that fell
+        behind) or one from before a server restart gets a single 'reset' event carrying the whole
+        queue instead, so the display can redraw from scratch.
+        """
+        with self._cond:
+            if cursor is not None and cursor <= self.version:
+                self._cond.wait_for(lambda: self.version > cursor, timeout)
+                if self.version == cursor:
+                    return []
+                if self._events and self._events[0][0] <= cursor + 1:
+                    # ids are consecutive, so the first event we want sits at a known offset
+                    start = cursor + 1 - self._events[0][0]
+                    return [self._events[i] for i in range(start, len(self._events))]
+            return [(self.version, {'type': 'reset', 'queue': list(self._entries.values())})]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def _changed(self, event_type, entry):
+        self.version += 1
+        self._events.append((self.version, {'type': event_type, 'entry': entry}))
+        self._cond.notify_all()
@@ -1,10 +1,33 @@
+import os
+import sys
+
 import cv2
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))  # for car_line
+from car_line.sources import IMAGE_EXTENSIONS, open_source
+
 '''
 This is just to test that your devices camera works.
+
+    python tests/test_camera_capture.py                               # camera 0
+    python tests/test_camera_capture.py 1                             # another camera
+    python tests/test_camera_capture.py tests/test-number-card.jpg    # show a still image
+    python tests/test_camera_capture.py sessions/tuesday              # play back a recording or video
 '''
+source = sys.argv[1] if len(sys.argv) > 1 else 0
+
 try:
-    cap = cv2.VideoCapture(0)
+    if isinstance(source, str) and source.lower().endswith(IMAGE_EXTENSIONS):
+        img = cv2.imread(source)
+        if img is None:
+            print(f"Error: Could not read {source}")
+            exit()
+        cv2.imshow("Test Image", img)
+        cv2.waitKey(0)  # Wait until a key is pressed
+        cv2.destroyAllWindows()
+        exit()
+
+    cap = open_source(source)
 
     if not cap.isOpened():
         print("Error: Could not open webcam")
@@ -27,10 +50,3 @@ try:
 
 except Exception as e:
     print(f"An error occurred: {e}")
-
-exit()
-
-img = cv2.imread("./tests/test-number-card.jpg")  # Replace with the path to an actual image
-cv2.imshow("Test Image", img)
-cv2.waitKey(0)  # Wait until a key is pressed
-cv2.destroyAllWindows()
\ No newline at end of file
@@ -1,7 +1,10 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
 import json
 import datetime
-import os
+from request_log_store import RequestLogStore
+from roster import PickupQueue, Roster
 
 class RequestHandler(BaseHTTPRequestHandler):
     def do_POST(self):
@@ -12,39 +15,162 @@ class RequestHandler(BaseHTTPRequestHandler):
         except json.JSONDecodeError:
             request_json = {"raw_data": post_data.decode('utf-8')} # capture non json posts.
 
+        if urlparse(self.path).path == '/dequeue':
+            # The display (or a teacher) marks a car as picked up: {"student_number": "478"}, or {} for the front car
+            number = request_json.get('student_number') if isinstance(request_json, dict) else None
+            entry = self.server.pickup_queue.dequeue(str(number) if number is not None else None)
+            self.send_json(200 if entry else 404, {"status": "dequeued" if entry else "not_found", "entry": entry})
+            return
+
         timestamp = datetime.datetime.now().isoformat()
+
+        # Batch posts carry several numbers: {"student_numbers": ["478", "233"]}, plus "lanes": ["1", "2"]
+        # when the camera process runs more than one lane
+        if isinstance(request_json, dict) and isinstance(request_json.get('student_numbers'), list):
+            numbers = [str(number) for number in request_json['student_numbers']]
+            lanes = request_json.get('lanes') or [None] * len(numbers)
+            if not isinstance(lanes, list) or len(lanes) != len(numbers):
+                # zip() would silently drop the numbers without a lane
+                self.send_json(400, {"status": "bad_request", "error": "lanes must have one entry per student number"})
+                return
+            results = []
+            for number, lane in zip(numbers, lanes):
+                request = {"student_number": number}
+                if lane is not None:
+                    request["lane"] = lane
+                self.store_request({"timestamp": timestamp, "request": request})
+                results.append(self.arrive(number, lane))
+            self.send_json(200, {"status": "received", "count": len(numbers), "results": results})
+            return
+
         log_entry = {
             "timestamp": timestamp,
             "request": request_json
         }
 
-        self.log_request(log_entry)
+        self.store_request(log_entry)
+        if isinstance(request_json, dict) and 'student_number' in request_json:
+            self.send_json(200, dict(self.arrive(str(request_json['student_number']), request_json.get('lane')),
+                                     status="received"))
+        else:
+            self.send_json(200, {"status": "received"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/events':
+            self.send_events(parse_qs(url.query))
+            return
+        if url.path != '/queue':
+            self.send_json(404, {"status": "not_found"})
+            return
+
+        # GET /queue returns the cars waiting; with ?since=<version> it waits (up to 25s) for something newer
+        query = parse_qs(url.query)
+        if 'since' in query:
+            since = query['since'][0]
+            if not since.lstrip('-').isdigit():
+                self.send_json(400, {"status": "bad_request", "error": "since must be a queue version number"})
+                return
+            version, entries = self.server.pickup_queue.wait_for_change(int(since), timeout=25)
+        else:
+            version, entries = self.server.pickup_queue.snapshot()
+        self.send_json(200, {"version": version, "queue": entries})
+
+    def send_events(self, query):
+        """
+        Pickup feed. Browsers (EventSource) get a Server-Sent Events stream; anything else gets a
+        long-poll: GET /events?cursor=<last id> answers as soon as there is something newer, with a
+        new cursor to pass next time. Leave the cursor off the first time to get the current queue.
+        """
+        cursor = self.headers.get('Last-Event-ID') or query.get('cursor', [None])[0]
+        cursor = int(cursor) if cursor is not None and cursor.lstrip('-').isdigit() else None
+        pickup_queue = self.server.pickup_queue
+
+        if 'text/event-stream' not in self.headers.get('Accept', ''):
+            events = pickup_queue.events_since(cursor, timeout=25)
+            next_cursor = events[-1][0] if events else cursor
+            self.send_json(200, {"cursor": next_cursor,
+                                 "events": [dict(event, id=event_id) for event_id, event in events]})
+            return
+
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
-        self.wfile.write(json.dumps({"status": "received"}).encode('utf-8'))
+        self.close_connection = True  # the stream has no length, so it ends with the connection
+        try:
+            while True:
+                events = pickup_queue.events_since(cursor, timeout=15)
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")  # comment line, stops proxies timing the stream out
+                for event_id, event in events:
+                    self.wfile.write(f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                                     .encode('utf-8'))
+                    cursor = event_id
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # display went away
 
-    def log_request(self, log_entry):
-        log_file = f"{os.path.dirname(__file__)}/../data/request_log.json"
-        log_data = []
+    def arrive(self, number, lane=None):
+        """Looks the number up in the roster and puts the car in the pickup queue."""
+        students = self.server.roster.lookup(number)
+        self.server.pickup_queue.enqueue(number, students, lane)
+        names = [student.get('student_name', '') for student in students]
+        return {"student_number": number, "student_name": ", ".join(names) if names else "Unknown",
+                "students": students}
 
-        if os.path.exists(log_file):
-            try:
-                with open(log_file, 'r') as f:
-                    log_data = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass # if file doesnt exist or is corrupt, start fresh
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))  # lets keep-alive clients reuse the connection
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # Not called log_request: BaseHTTPRequestHandler.send_response calls log_request(code), which
+    # used to put stray status codes like 200 into the log.
+    def store_request(self, log_entry):
+        # Appends one line to data/request_log.jsonl instead of rewriting the whole log
+        self.server.request_log.append(log_entry)
 
-        log_data.append(log_entry)
+class KeepAliveRequestHandler(RequestHandler):
+    """HTTP/1.1 handler, so each lane keeps one connection open instead of reconnecting for every post."""
+    protocol_version = "HTTP/1.1"
+    timeout = 30  # close idle keep-alive connections after this many seconds
+    disable_nagle_algorithm = True  # headers and body go out in separate writes; don't let them wait on ACKs
 
-        with open(log_file, 'w') as f:
-            json.dump(log_data, f, indent=4)
+def setup_server(httpd, request_log=None, roster=None):
+    """Attaches the request log, roster and pickup queue the handlers use."""
+    # RequestLogStore is lock-protected, so handler threads can append to it concurrently
+    httpd.request_log = request_log or RequestLogStore()
+    httpd.roster = roster or Roster().start_watching()
+    httpd.pickup_queue = PickupQueue()
+    return httpd
 
-def run(server_class=HTTPServer, handler_class=RequestHandler, port=8080):
+def run(server_class=ThreadingHTTPServer, handler_class=KeepAliveRequestHandler, port=8080, roster_file=None):
     server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
+    httpd = setup_server(server_class(server_address, handler_class),
+                         roster=Roster(roster_file).start_watching() if roster_file else None)
     print(f'Starting httpd on port {port}...')
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.roster.stop()
+        httpd.request_log.close()
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Test server that logs the student numbers posted to it.")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--roster', help="roster CSV or SQLite file (default: data/roster.csv)")
+    parser.add_argument('--single-threaded', action='store_true',
+                        help="handle one connection at a time (the old HTTPServer behaviour)")
+    args = parser.parse_args()
+
+    if args.single_threaded:
+        # A single-threaded server can't hold keep-alive connections open, so it stays on HTTP/1.0
+        run(HTTPServer, RequestHandler, port=args.port, roster_file=args.roster)
+    else:
+        run(port=args.port, roster_file=args.roster)